@@ -1,16 +1,32 @@
+import shlex
 from pathlib import Path
-from pprint import pformat
 
 from binaryninja.binaryview import BinaryView
-from binaryninja.interaction import get_open_filename_input
+from binaryninja.interaction import (
+    ChoiceField,
+    DirectoryNameField,
+    TextLineField,
+    get_form_input,
+    get_open_filename_input,
+)
 from binaryninja.log import Logger
-from pyparsing import ParseException
-
-from ..parse import parse
-from .type_import import create_binary_view_types
+from binaryninja.typelibrary import TypeLibrary
 
 logger = Logger(session_id=0, logger_name=__name__)
 
+DEFAULT_BUILD_COMMAND = "cargo +nightly build -j 1"
+
+SETTING_LOG_PARSED_TYPES = "rustTypeLayoutHelper.logParsedTypes"
+SETTING_REMOVE_VANISHED_TYPES = "rustTypeLayoutHelper.removeVanishedTypes"
+SETTING_RESOLVE_FIELD_TYPES = "rustTypeLayoutHelper.resolveFieldTypes"
+SETTING_OVERLAY_ENUM_VARIANTS = "rustTypeLayoutHelper.overlayEnumVariants"
+SETTING_INCLUDE_TYPES = "rustTypeLayoutHelper.includeTypes"
+SETTING_EXCLUDE_TYPES = "rustTypeLayoutHelper.excludeTypes"
+SETTING_ROOT_TYPES = "rustTypeLayoutHelper.rootTypes"
+SETTING_SKIP_MALFORMED_RECORDS = "rustTypeLayoutHelper.skipMalformedRecords"
+SETTING_CACHE_PARSED_FILES = "rustTypeLayoutHelper.cacheParsedFiles"
+SETTING_CACHE_MAX_SIZE_MEGABYTES = "rustTypeLayoutHelper.cacheMaxSizeMegabytes"
+
 
 def action_load_type_layout_file(bv: BinaryView):
     type_layout_file_path = get_open_filename_input(
@@ -19,13 +35,56 @@ def action_load_type_layout_file(bv: BinaryView):
     logger.log_info(f"{type_layout_file_path}")
 
     if type_layout_file_path is not None:
-        type_layout_file_path = Path(type_layout_file_path)
-        with open(type_layout_file_path) as type_layout_file:
-            try:
-                parsed_rust_types = parse(type_layout_file)
-                logger.log_info(f"{pformat(parsed_rust_types)}")
-                create_binary_view_types(bv=bv, rust_types=parsed_rust_types)
-            except ParseException as err:
-                logger.log_error(
-                    f"Failed to parse the provided Rust type layout file {type_layout_file_path}: {err.explain()}"
-                )
+        # The parser and the type import code, along with pyparsing, are only
+        # imported once a file is loaded, rather than when Binary Ninja starts.
+        from .load_task import LoadTypeLayoutFileTask
+
+        LoadTypeLayoutFileTask(
+            bv=bv, type_layout_file_path=Path(type_layout_file_path)
+        ).start()
+
+
+def action_load_build_output(bv: BinaryView):
+    project_directory_field = DirectoryNameField("Cargo project directory")
+    build_command_field = TextLineField("Build command", DEFAULT_BUILD_COMMAND)
+    clean_first_field = ChoiceField(
+        "Run `cargo clean` first (required for a complete set of types)",
+        ["Yes", "No"],
+    )
+    if not get_form_input(
+        [project_directory_field, build_command_field, clean_first_field],
+        "Load Types From Build",
+    ):
+        return
+    if not project_directory_field.result:
+        return
+
+    command = shlex.split(build_command_field.result or DEFAULT_BUILD_COMMAND)
+
+    from .load_task import LoadBuildOutputTask
+
+    LoadBuildOutputTask(
+        bv=bv,
+        command=command,
+        project_directory=Path(project_directory_field.result),
+        clean_first=clean_first_field.result == 0,
+    ).start()
+
+
+def action_attach_type_library(bv: BinaryView):
+    type_library_path = get_open_filename_input(
+        prompt="Open a Rust type library", ext="*.bntl"
+    )
+    if type_library_path is None:
+        return
+
+    type_library = TypeLibrary.load_from_file(type_library_path)
+    if type_library is None:
+        logger.log_error(f"Failed to load the type library {type_library_path}")
+        return
+    # The library's types are only imported into the BinaryView
+    # once they are referenced.
+    bv.add_type_library(type_library)
+    logger.log_info(
+        f"Attached the type library {type_library.name}, with {len(type_library.named_types)} types"
+    )
@@ -0,0 +1,286 @@
+"""
+Apply a type layout file to many Binary Ninja databases, without the UI.
+
+The type layout file is parsed once, and the parsed types are shared with
+a pool of worker processes, each of which opens databases with the
+headless Binary Ninja API, creates the types, and saves the database.
+
+Run this as a module from the directory containing the plugin, e.g.:
+
+    python -m rust_type_layout_helper.binja_plugin.headless type-sizes.txt *.bndb
+
+Alternatively, the types can be written to a type library, which can then
+be attached to any database:
+
+    python -m rust_type_layout_helper.binja_plugin.headless type-sizes.txt \\
+        --type-library my-crate.bntl --platform windows-x86_64
+"""
+
+import multiprocessing
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import binaryninja
+from pyparsing import ParseException
+
+from ..parse import (
+    MalformedRecord,
+    OnError,
+    TypeFilter,
+    deduplicate_types,
+    iter_load_jsonl,
+    iter_parse_path,
+    type_name_filter,
+)
+from ..parse import Type as RustType
+from .type_import import create_binary_view_types, create_type_library
+
+# The parsed types, as received by each worker process.
+_worker_rust_types: List[RustType] = []
+_worker_remove_vanished_types = False
+_worker_overlay_enum_variants = False
+
+
+def _init_worker(
+    rust_types: List[RustType],
+    remove_vanished_types: bool,
+    overlay_enum_variants: bool,
+):
+    global _worker_rust_types, _worker_remove_vanished_types
+    global _worker_overlay_enum_variants
+    _worker_rust_types = rust_types
+    _worker_remove_vanished_types = remove_vanished_types
+    _worker_overlay_enum_variants = overlay_enum_variants
+
+
+def _open_binary_view(database_path: Path):
+    # `binaryninja.load` is only available in newer versions of Binary Ninja.
+    if hasattr(binaryninja, "load"):
+        return binaryninja.load(str(database_path), update_analysis=False)
+    else:
+        return binaryninja.BinaryViewType.get_view_of_file(
+            str(database_path), update_analysis=False
+        )
+
+
+def _import_into_database(database_path: Path) -> Optional[str]:
+    """
+    Create the parsed types in a single database, and save it.
+    Returns an error message on failure.
+    """
+    # Newer versions of Binary Ninja raise an exception when a file cannot be
+    # opened, rather than returning `None`.
+    try:
+        bv = _open_binary_view(database_path)
+    except Exception as err:
+        return f"Could not open {database_path}: {err}"
+    if bv is None:
+        return f"Could not open {database_path}"
+
+    try:
+        create_binary_view_types(
+            bv=bv,
+            rust_types=_worker_rust_types,
+            remove_vanished_types=_worker_remove_vanished_types,
+            overlay_enum_variants=_worker_overlay_enum_variants,
+        )
+        if database_path.suffix == ".bndb":
+            saved = bv.file.save_auto_snapshot()
+        else:
+            # A binary rather than a database was given;
+            # create a new database next to it.
+            saved = bv.create_database(str(database_path) + ".bndb")
+    except Exception as err:
+        # Report the failure, rather than stopping the imports
+        # into all of the other databases.
+        return f"Failed to import types into {database_path}: {err}"
+    finally:
+        bv.file.close()
+
+    if not saved:
+        return f"Could not save {database_path}"
+    return None
+
+
+def load_rust_types(
+    type_layout_file_path: Path,
+    type_filter: Optional[TypeFilter] = None,
+    on_error: Optional[OnError] = None,
+) -> List[RustType]:
+    if type_layout_file_path.suffix == ".jsonl":
+        with open(type_layout_file_path) as type_layout_file:
+            rust_types = iter_load_jsonl(type_layout_file)
+            if type_filter is not None:
+                rust_types = (
+                    rust_type
+                    for rust_type in rust_types
+                    if type_filter(rust_type.type_name)
+                )
+            return list(deduplicate_types(rust_types))
+    else:
+        return list(
+            deduplicate_types(
+                iter_parse_path(
+                    type_layout_file_path, type_filter=type_filter, on_error=on_error
+                )
+            )
+        )
+
+
+def import_into_databases(
+    rust_types: List[RustType],
+    database_paths: Sequence[Path],
+    workers: int,
+    remove_vanished_types: bool = False,
+    overlay_enum_variants: bool = False,
+) -> Dict[Path, Optional[str]]:
+    """
+    Create the given types in each of the databases, using a pool of
+    `workers` processes. Returns an error message, or `None` on success,
+    for each database.
+    """
+    # Worker processes are spawned rather than forked, as the Binary Ninja
+    # core in this process is multithreaded, and may already be initialized.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(rust_types, remove_vanished_types, overlay_enum_variants),
+    ) as executor:
+        results = executor.map(_import_into_database, database_paths)
+        return dict(zip(database_paths, results))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    argparser = ArgumentParser(
+        description="Import a Rust type layout file into many Binary Ninja databases"
+    )
+    argparser.add_argument(
+        "type_layout_file",
+        help="The output of `rustc +nightly -Zprint-type-sizes`, or a .jsonl file exported by parse.py",
+    )
+    argparser.add_argument(
+        "databases",
+        nargs="*",
+        help="The Binary Ninja databases to import the types into",
+    )
+    argparser.add_argument(
+        "--type-library",
+        help="Write the types to a Binary Ninja type library (.bntl) at this path",
+    )
+    argparser.add_argument(
+        "--platform",
+        help="The Binary Ninja platform which the type library is for, e.g. windows-x86_64; required with --type-library",
+    )
+    argparser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of databases to process at once",
+    )
+    argparser.add_argument(
+        "--remove-vanished-types",
+        action="store_true",
+        help="Remove types created by previous imports, for Rust types which are not in the type layout file",
+    )
+    argparser.add_argument(
+        "--overlay-enum-variants",
+        action="store_true",
+        help="Make the struct for each enum variant as large as the whole enum, overlapping the discriminant, so that its fields are at their offsets in the enum",
+    )
+    argparser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        help="Only import types whose names match this glob pattern, or regular expression if prefixed with `re:`; may be repeated",
+    )
+    argparser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Do not import types whose names match this glob pattern, or regular expression if prefixed with `re:`; may be repeated",
+    )
+    argparser.add_argument(
+        "--root",
+        action="append",
+        default=[],
+        help="Only import this type and the types in its generic arguments; may be repeated",
+    )
+    argparser.add_argument(
+        "--tolerant",
+        action="store_true",
+        help="Skip malformed type records in the type layout file, reporting them, rather than failing",
+    )
+    args = argparser.parse_args(argv)
+    if not args.databases and args.type_library is None:
+        argparser.error("either databases or --type-library must be given")
+    if args.type_library is not None and args.platform is None:
+        argparser.error("--platform is required with --type-library")
+
+    def report_malformed_record(error: MalformedRecord):
+        print(
+            f"Skipped malformed record on line {error.line_number} of {args.type_layout_file}: {error.line}",
+            file=sys.stderr,
+        )
+
+    type_filter = type_name_filter(
+        include=args.include, exclude=args.exclude, roots=args.root
+    )
+    try:
+        rust_types = load_rust_types(
+            Path(args.type_layout_file),
+            type_filter,
+            on_error=report_malformed_record if args.tolerant else None,
+        )
+    except ParseException as err:
+        print(
+            f"Failed to parse the provided Rust type layout file {args.type_layout_file}: {err.explain()}",
+            file=sys.stderr,
+        )
+        return 1
+    except ValueError as err:
+        print(
+            f"Failed to load the provided Rust type layout file {args.type_layout_file}: {err}",
+            file=sys.stderr,
+        )
+        return 1
+
+    if args.type_library is not None:
+        try:
+            platform = binaryninja.Platform[args.platform]
+        except KeyError:
+            print(f"Unknown platform {args.platform}", file=sys.stderr)
+            return 1
+        type_library = create_type_library(
+            rust_types,
+            name=Path(args.type_library).stem,
+            platform=platform,
+            overlay_enum_variants=args.overlay_enum_variants,
+        )
+        type_library.write_to_file(args.type_library)
+        print(f"Wrote {len(rust_types)} types to {args.type_library}")
+
+    results = import_into_databases(
+        rust_types,
+        [Path(database) for database in args.databases],
+        workers=args.workers,
+        remove_vanished_types=args.remove_vanished_types,
+        overlay_enum_variants=args.overlay_enum_variants,
+    )
+
+    failed = False
+    for database_path, error in results.items():
+        if error is None:
+            print(f"Imported {len(rust_types)} types into {database_path}")
+        else:
+            print(error, file=sys.stderr)
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+import os
+import shlex
+import subprocess
+import tempfile
+from pathlib import Path
+from pprint import pformat
+from typing import Iterable, Iterator, List, Optional
+
+from binaryninja import user_directory
+from binaryninja.binaryview import BinaryView
+from binaryninja.log import Logger
+from binaryninja.plugin import BackgroundTaskThread
+from binaryninja.settings import Settings
+from pyparsing import ParseException
+
+from ..cache import cached_parse_path
+from ..parse import (
+    MalformedRecord,
+    OnError,
+    TypeFilter,
+    deduplicate_types,
+    iter_load_jsonl,
+    iter_parse_command,
+    iter_parse_path,
+    type_name_filter,
+)
+from ..parse import Type as RustType
+from .actions import (
+    SETTING_CACHE_MAX_SIZE_MEGABYTES,
+    SETTING_CACHE_PARSED_FILES,
+    SETTING_EXCLUDE_TYPES,
+    SETTING_INCLUDE_TYPES,
+    SETTING_LOG_PARSED_TYPES,
+    SETTING_OVERLAY_ENUM_VARIANTS,
+    SETTING_REMOVE_VANISHED_TYPES,
+    SETTING_RESOLVE_FIELD_TYPES,
+    SETTING_ROOT_TYPES,
+    SETTING_SKIP_MALFORMED_RECORDS,
+)
+from .type_import import create_binary_view_types
+
+logger = Logger(session_id=0, logger_name=__name__)
+
+PRINT_TYPE_SIZES_FLAG = "-Zprint-type-sizes"
+
+# How much of the end of a failed build's output to log.
+BUILD_OUTPUT_LOG_CHARACTERS = 4096
+
+# How many types to process between updates of the background task's progress text.
+PROGRESS_UPDATE_INTERVAL = 100
+
+
+def _log_conflicting_rust_types(seen_type: RustType, conflicting_type: RustType):
+    logger.log_warn(
+        f"Rust type {seen_type.type_name} has conflicting layouts; keeping the first one seen. First layout: {seen_type}, conflicting layout: {conflicting_type}"
+    )
+
+
+def _iter_load_jsonl_path(path: Path) -> Iterator[RustType]:
+    with open(path) as jsonl_file:
+        yield from iter_load_jsonl(jsonl_file)
+
+
+def _cache_directory() -> Path:
+    return Path(user_directory()) / "rust_type_layout_helper" / "cache"
+
+
+class _LoadRustTypesTask(BackgroundTaskThread):
+    """
+    Parses Rust types from some source, and creates Binary Ninja types for
+    them. Subclasses implement `_load_rust_types`, and describe the source
+    of the types in `source_description`, for log messages.
+    """
+
+    def __init__(self, bv: BinaryView, source_description: str):
+        super().__init__(
+            initial_progress_text="Rust Type Layout Helper: Parsing types...",
+            can_cancel=True,
+        )
+        self.bv = bv
+        self.source_description = source_description
+        self.log_parsed_types = Settings().get_bool(SETTING_LOG_PARSED_TYPES)
+        self.remove_vanished_types = Settings().get_bool(
+            SETTING_REMOVE_VANISHED_TYPES, bv
+        )
+        self.resolve_field_types = Settings().get_bool(SETTING_RESOLVE_FIELD_TYPES, bv)
+        self.overlay_enum_variants = Settings().get_bool(
+            SETTING_OVERLAY_ENUM_VARIANTS, bv
+        )
+        include = Settings().get_string_list(SETTING_INCLUDE_TYPES, bv)
+        exclude = Settings().get_string_list(SETTING_EXCLUDE_TYPES, bv)
+        roots = Settings().get_string_list(SETTING_ROOT_TYPES, bv)
+        self.type_filter: Optional[TypeFilter] = None
+        if include or exclude or roots:
+            self.type_filter = type_name_filter(
+                include=include, exclude=exclude, roots=roots
+            )
+        self.on_malformed_record: Optional[OnError] = None
+        if Settings().get_bool(SETTING_SKIP_MALFORMED_RECORDS, bv):
+            self.on_malformed_record = self._log_malformed_record
+        self.malformed_record_count = 0
+        self.cache_parsed_files = Settings().get_bool(SETTING_CACHE_PARSED_FILES)
+        self.cache_max_size_bytes = (
+            Settings().get_integer(SETTING_CACHE_MAX_SIZE_MEGABYTES) * 1024 * 1024
+        )
+
+    def _track_parsed_rust_types(
+        self, rust_types: Iterable[RustType]
+    ) -> Iterator[RustType]:
+        parsed_type_count = 0
+        for rust_type in rust_types:
+            # Stop between types, rather than in the middle of one.
+            if self.cancelled:
+                return
+            if self.log_parsed_types:
+                logger.log_info(f"{pformat(rust_type)}")
+            yield rust_type
+
+            parsed_type_count += 1
+            if parsed_type_count % PROGRESS_UPDATE_INTERVAL == 0:
+                self.progress = (
+                    f"Rust Type Layout Helper: Parsed {parsed_type_count} types..."
+                )
+
+    def _log_malformed_record(self, error: MalformedRecord):
+        self.malformed_record_count += 1
+        type_description = (
+            "" if error.type_name is None else f" of Rust type {error.type_name}"
+        )
+        logger.log_warn(
+            f"Skipped the malformed record{type_description} on line {error.line_number} of {self.source_description}: {error.line}"
+        )
+
+    def _update_define_progress(self, defined_type_count: int, total_type_count: int):
+        if defined_type_count % PROGRESS_UPDATE_INTERVAL == 0:
+            self.progress = f"Rust Type Layout Helper: Defined {defined_type_count} / {total_type_count} types..."
+        return not self.cancelled
+
+    def _load_rust_types(self) -> Iterable[RustType]:
+        raise NotImplementedError
+
+    def run(self):
+        try:
+            rust_types = list(
+                deduplicate_types(
+                    self._load_rust_types(),
+                    on_conflict=_log_conflicting_rust_types,
+                )
+            )
+            # Types from a cancelled load are not built or defined at all.
+            if not self.cancelled:
+                create_binary_view_types(
+                    bv=self.bv,
+                    rust_types=rust_types,
+                    progress_func=self._update_define_progress,
+                    remove_vanished_types=self.remove_vanished_types,
+                    type_filter=self.type_filter,
+                    resolve_field_types=self.resolve_field_types,
+                    overlay_enum_variants=self.overlay_enum_variants,
+                    is_cancelled=lambda: self.cancelled,
+                )
+        except ParseException as err:
+            logger.log_error(
+                f"Failed to parse {self.source_description}: {err.explain()}"
+            )
+            return
+        except ValueError as err:
+            logger.log_error(f"Failed to load {self.source_description}: {err}")
+            return
+        except (OSError, subprocess.CalledProcessError) as err:
+            logger.log_error(
+                f"Failed to load {self.source_description}; no types were imported: {err}"
+            )
+            return
+
+        if self.malformed_record_count > 0:
+            logger.log_warn(
+                f"Skipped {self.malformed_record_count} malformed records in {self.source_description}"
+            )
+        if self.cancelled:
+            logger.log_warn(f"Loading of {self.source_description} was cancelled")
+
+
+class LoadTypeLayoutFileTask(_LoadRustTypesTask):
+    def __init__(self, bv: BinaryView, type_layout_file_path: Path):
+        super().__init__(
+            bv=bv,
+            source_description=f"Rust type layout file {type_layout_file_path}",
+        )
+        self.type_layout_file_path = type_layout_file_path
+
+    def _load_rust_types(self) -> Iterable[RustType]:
+        # Files which have already been parsed and exported with
+        # `parse.py --output-format jsonl` are loaded directly.
+        if self.type_layout_file_path.suffix == ".jsonl":
+            return self._track_parsed_rust_types(
+                _iter_load_jsonl_path(self.type_layout_file_path)
+            )
+
+        if not self.cache_parsed_files:
+            return self._track_parsed_rust_types(
+                iter_parse_path(
+                    self.type_layout_file_path,
+                    type_filter=self.type_filter,
+                    on_error=self.on_malformed_record,
+                )
+            )
+
+        return cached_parse_path(
+            self.type_layout_file_path,
+            _cache_directory(),
+            self.cache_max_size_bytes,
+            type_filter=self.type_filter,
+            on_error=self.on_malformed_record,
+            track_parsed_types=self._track_parsed_rust_types,
+        )
+
+
+class LoadBuildOutputTask(_LoadRustTypesTask):
+    """
+    Runs a build command, such as `cargo +nightly build -j 1`, with
+    `-Zprint-type-sizes` added to its `RUSTFLAGS`, and parses the types
+    as they are printed, so that parsing overlaps with compilation.
+    """
+
+    def __init__(
+        self,
+        bv: BinaryView,
+        command: List[str],
+        project_directory: Path,
+        clean_first: bool,
+    ):
+        command_line = " ".join(shlex.quote(argument) for argument in command)
+        super().__init__(
+            bv=bv,
+            source_description=f"the output of `{command_line}` in {project_directory}",
+        )
+        self.command = command
+        self.project_directory = project_directory
+        self.clean_first = clean_first
+
+    def _iter_build_rust_types(self) -> Iterator[RustType]:
+        env = dict(os.environ)
+        env["RUSTFLAGS"] = " ".join(
+            flag for flag in (env.get("RUSTFLAGS"), PRINT_TYPE_SIZES_FLAG) if flag
+        )
+
+        # Types are only printed for crates which are actually compiled.
+        if self.clean_first:
+            self.progress = "Rust Type Layout Helper: Cleaning build..."
+            subprocess.run(
+                ["cargo", "clean"],
+                cwd=self.project_directory,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=True,
+            )
+
+        self.progress = "Rust Type Layout Helper: Building and parsing types..."
+        # The compiler's progress and warnings, printed to stderr, are only
+        # shown if the build fails.
+        with tempfile.TemporaryFile() as stderr_file:
+            try:
+                yield from iter_parse_command(
+                    self.command,
+                    cwd=self.project_directory,
+                    env=env,
+                    stderr=stderr_file.fileno(),
+                    type_filter=self.type_filter,
+                    on_error=self.on_malformed_record,
+                )
+            except subprocess.CalledProcessError:
+                stderr_file.seek(0)
+                build_output = stderr_file.read().decode("utf-8", errors="replace")
+                logger.log_error(
+                    f"The build failed; its last output was:\n{build_output[-BUILD_OUTPUT_LOG_CHARACTERS:]}"
+                )
+                raise
+
+    def _load_rust_types(self) -> Iterable[RustType]:
+        return self._track_parsed_rust_types(self._iter_build_rust_types())
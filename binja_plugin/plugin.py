@@ -1,5 +1,8 @@
+import json
+
 from binaryninja.log import Logger
 from binaryninja.plugin import PluginCommand
+from binaryninja.settings import Settings
 
 from . import actions
 
@@ -12,11 +15,126 @@ plugin_commands = [
         f"{PLUGIN_NAME}\\Load File...",
         "Load a new type layout file",
         actions.action_load_type_layout_file,
-    )
+    ),
+    (
+        f"{PLUGIN_NAME}\\Load From Build...",
+        "Run a Rust build with -Zprint-type-sizes, and load the types as they are printed",
+        actions.action_load_build_output,
+    ),
+    (
+        f"{PLUGIN_NAME}\\Attach Type Library...",
+        "Attach a type library created by the headless importer",
+        actions.action_attach_type_library,
+    ),
+]
+
+
+settings = [
+    (
+        actions.SETTING_LOG_PARSED_TYPES,
+        {
+            "title": "Log parsed types",
+            "type": "boolean",
+            "default": False,
+            "description": "Log the full contents of every parsed Rust type when loading a type layout file. This is slow for large files, and is only useful for debugging.",
+            "ignore": ["SettingsProjectScope", "SettingsResourceScope"],
+        },
+    ),
+    (
+        actions.SETTING_REMOVE_VANISHED_TYPES,
+        {
+            "title": "Remove vanished types on re-import",
+            "type": "boolean",
+            "default": False,
+            "description": "When loading a type layout file into a database which already has types imported from a previous type layout file, remove the types for Rust types which are not in the new file.",
+        },
+    ),
+    (
+        actions.SETTING_RESOLVE_FIELD_TYPES,
+        {
+            "title": "Use named types for fields",
+            "type": "boolean",
+            "default": True,
+            "description": "Give fields such as the `.0` of `Option<std::fs::File>` the imported type named in the generic arguments, when it is the only one with the field's size, rather than an integer or array of that size.",
+        },
+    ),
+    (
+        actions.SETTING_OVERLAY_ENUM_VARIANTS,
+        {
+            "title": "Overlay enum variants on the discriminant",
+            "type": "boolean",
+            "default": False,
+            "description": "Make the struct for each variant of a Rust enum as large as the whole enum, overlapping the discriminant, so that its fields are at the same offsets as in the enum, e.g. when a pointer to the enum is used to access a variant's fields. Otherwise, the variant structs start after the discriminant.",
+        },
+    ),
+    (
+        actions.SETTING_INCLUDE_TYPES,
+        {
+            "title": "Types to import",
+            "type": "array",
+            "elementType": "string",
+            "default": [],
+            "description": "Only import the types whose names match one of these glob patterns, such as `std::*`. Patterns starting with `re:` are regular expressions. If empty, all types are imported.",
+        },
+    ),
+    (
+        actions.SETTING_EXCLUDE_TYPES,
+        {
+            "title": "Types to exclude",
+            "type": "array",
+            "elementType": "string",
+            "default": [],
+            "description": "Do not import the types whose names match one of these glob patterns, such as `{closure@*`. Patterns starting with `re:` are regular expressions.",
+        },
+    ),
+    (
+        actions.SETTING_ROOT_TYPES,
+        {
+            "title": "Root types",
+            "type": "array",
+            "elementType": "string",
+            "default": [],
+            "description": "If not empty, only import these types, and the types which appear in their generic arguments, e.g. `std::io::Error` for `std::result::Result<(), std::io::Error>`.",
+        },
+    ),
+    (
+        actions.SETTING_SKIP_MALFORMED_RECORDS,
+        {
+            "title": "Skip malformed records",
+            "type": "boolean",
+            "default": True,
+            "description": "When a type layout file contains malformed lines, such as compiler warnings mixed into the output, skip the types containing them and log a warning, rather than failing to load the whole file.",
+        },
+    ),
+    (
+        actions.SETTING_CACHE_PARSED_FILES,
+        {
+            "title": "Cache parsed type layout files",
+            "type": "boolean",
+            "default": True,
+            "description": "Store the parsed contents of each loaded type layout file in the Binary Ninja user directory, so that loading a file with the same contents again does not need to re-parse it. Files are not cached while only some types are imported with the include, exclude, or root types settings, but a file which is already cached is still loaded from the cache.",
+            "ignore": ["SettingsProjectScope", "SettingsResourceScope"],
+        },
+    ),
+    (
+        actions.SETTING_CACHE_MAX_SIZE_MEGABYTES,
+        {
+            "title": "Parsed type layout file cache size (MB)",
+            "type": "number",
+            "default": 1024,
+            "minValue": 0,
+            "description": "The maximum total size of the parsed type layout file cache. The least recently used entries are removed when the cache grows larger than this.",
+            "ignore": ["SettingsProjectScope", "SettingsResourceScope"],
+        },
+    ),
 ]
 
 
 def plugin_init():
+    Settings().register_group("rustTypeLayoutHelper", PLUGIN_NAME)
+    for setting_name, setting_properties in settings:
+        Settings().register_setting(setting_name, json.dumps(setting_properties))
+
     for command_name, command_description, command_action in plugin_commands:
         PluginCommand.register(
             name=command_name, description=command_description, action=command_action
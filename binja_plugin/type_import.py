@@ -1,12 +1,14 @@
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 from binaryninja.binaryview import BinaryView
 from binaryninja.log import Logger
+from binaryninja.platform import Platform
+from binaryninja.typelibrary import TypeLibrary
 from binaryninja.types import (
     ArrayType,
     EnumerationBuilder,
+    EnumerationType,
     IntegerType,
-    QualifiedName,
     StructureBuilder,
     StructureType,
     StructureVariant,
@@ -14,11 +16,34 @@ from binaryninja.types import (
     VoidType,
 )
 
-from ..parse import Discriminant, Field, Padding, Variant
+from ..parse import (
+    Discriminant,
+    Field,
+    Padding,
+    TypeFilter,
+    Variant,
+    layout_fingerprint,
+)
 from ..parse import Type as RustType
+from ..type_graph import TypeGraph
 
 logger = Logger(session_id=0, logger_name=__name__)
 
+# A Binary Ninja type to be defined on the BinaryView, along with its name.
+TypeDefinition = Tuple[str, Type]
+
+# Called with the number of types defined so far, and the total number of types.
+# Returns `False` to stop defining types.
+ProgressFunc = Callable[[int, int], bool]
+
+# The BinaryView metadata key under which the fingerprints of imported types
+# are recorded, for incremental re-imports.
+IMPORTED_TYPES_METADATA_KEY = "rust_type_layout_helper.imported_types"
+
+# Incremented whenever the Binary Ninja types created for the same Rust type
+# change, so that types imported by older versions are redefined.
+IMPORTER_VERSION = 3
+
 
 def _create_bn_type_from_field_size(field_size: int) -> Type:
     if field_size == 0:
@@ -29,31 +54,159 @@ def _create_bn_type_from_field_size(field_size: int) -> Type:
         return ArrayType.create(Type.char(), field_size)
 
 
-def _create_variant_struct(rust_variant: Variant) -> StructureType:
-    bn_struct = StructureBuilder.create(packed=True)
+def _create_bn_type_from_field(
+    rust_type: RustType,
+    rust_field: Field,
+    rust_variant: Optional[Variant],
+    type_graph: Optional[TypeGraph],
+) -> Type:
+    field_type = (
+        None
+        if type_graph is None
+        else type_graph.field_type(rust_type, rust_field, rust_variant)
+    )
+    if field_type is None:
+        return _create_bn_type_from_field_size(rust_field.field_size)
 
-    if rust_variant.fields is not None:
-        for rust_struct_field in rust_variant.fields:
-            if isinstance(rust_struct_field, Field):
-                bn_field_type = _create_bn_type_from_field_size(
-                    rust_struct_field.field_size
-                )
-                bn_struct.append(type=bn_field_type, name=rust_struct_field.field_name)
-            elif isinstance(rust_struct_field, Padding):
-                bn_field_type = _create_bn_type_from_field_size(
-                    rust_struct_field.padding_size
-                )
-                bn_struct.append(type=bn_field_type, name="_padding")
+    # The field's type is referred to by name, with a placeholder of the
+    # same size, so that it does not need to be defined yet.
+    return Type.named_type_from_type(
+        name=field_type.type_name,
+        type=StructureBuilder.create(
+            packed=True, width=field_type.type_size
+        ).immutable_copy(),
+    )
+
+
+def _insert_bn_fields(
+    bn_struct: StructureBuilder,
+    rust_type: RustType,
+    rust_fields: Sequence[Union[Field, Padding, Discriminant, Variant]],
+    rust_variant: Optional[Variant],
+    type_graph: Optional[TypeGraph],
+    description: str,
+    first_offset: int = 0,
+    struct_offset: int = 0,
+) -> int:
+    """
+    Insert the fields of a Rust struct or variant into `bn_struct`,
+    returning the number of bytes covered by the fields and padding.
+
+    Each field is placed at its recorded offset, if rustc printed one,
+    or else directly after the preceding field or padding, as rustc does.
+    Offsets are from the start of the whole Rust type: the first field of
+    a variant starts at `first_offset`, after the discriminant, and
+    `bn_struct` itself starts at `struct_offset` within the Rust type.
+    Padding is left as a gap between fields, rather than being created
+    as a member.
+    """
+    offset = first_offset
+    for rust_field in rust_fields:
+        if isinstance(rust_field, Padding):
+            offset += rust_field.padding_size
+            continue
+        elif not isinstance(rust_field, Field):
+            continue
+
+        if rust_field.field_offset_bytes is not None:
+            field_offset = rust_field.field_offset_bytes
+        else:
+            field_offset = offset
+        bn_field_offset = field_offset - struct_offset
+        if (
+            bn_field_offset < 0
+            or bn_field_offset + rust_field.field_size > bn_struct.width
+        ):
+            logger.log_error(
+                f"Field {rust_field.field_name} of {description} at offset {bn_field_offset} ({rust_field.field_size} bytes) does not fit in its size ({bn_struct.width} bytes); skipping it"
+            )
+            # Inserting the field would grow the struct past its size.
+            offset = field_offset + rust_field.field_size
+            continue
+        elif (
+            rust_field.field_alignment_bytes
+            and field_offset % rust_field.field_alignment_bytes
+        ):
+            logger.log_error(
+                f"Field {rust_field.field_name} of {description} at offset {bn_field_offset} is not aligned to {rust_field.field_alignment_bytes} bytes"
+            )
+
+        # Fields printed with an offset may overlap preceding fields,
+        # e.g. in a union, so existing fields are not overwritten.
+        bn_struct.insert(
+            bn_field_offset,
+            _create_bn_type_from_field(rust_type, rust_field, rust_variant, type_graph),
+            rust_field.field_name,
+            overwrite_existing=False,
+        )
+        offset = field_offset + rust_field.field_size
+    return offset - first_offset
+
+
+def _create_variant_struct(
+    rust_type: RustType,
+    rust_variant: Variant,
+    type_graph: Optional[TypeGraph],
+    discriminant_size: int,
+    overlay_enum_variants: bool,
+) -> StructureType:
+    # An overlaid variant struct spans the whole enum, overlapping the
+    # discriminant, so that its fields are at their offsets in the enum.
+    if overlay_enum_variants:
+        bn_struct = StructureBuilder.create(packed=True, width=rust_type.type_size)
+        struct_offset = 0
+    else:
+        bn_struct = StructureBuilder.create(
+            packed=True, width=rust_variant.variant_size
+        )
+        struct_offset = discriminant_size
+
+    description = (
+        f"variant {rust_variant.variant_name} of Rust type {rust_type.type_name}"
+    )
+    variant_size = _insert_bn_fields(
+        bn_struct,
+        rust_type,
+        rust_variant.fields or [],
+        rust_variant,
+        type_graph,
+        description,
+        first_offset=discriminant_size,
+        struct_offset=struct_offset,
+    )
 
-    if bn_struct.width != rust_variant.variant_size:
+    if variant_size != rust_variant.variant_size:
         logger.log_error(
-            f"Size of created variant struct ({bn_struct.width} bytes) does not match size of parsed Rust variant struct ({rust_variant.variant_size} bytes)"
+            f"Fields of {description} cover {variant_size} bytes, which does not match its size ({rust_variant.variant_size} bytes)"
         )
 
     return bn_struct.immutable_copy()
 
 
-def _create_bn_types_for_rust_type(bv: BinaryView, rust_type: RustType):
+def _create_discriminant_enum(
+    rust_discriminant: Discriminant, rust_variants: List[Variant]
+) -> EnumerationType:
+    bn_discriminant_enum = EnumerationBuilder.create(
+        width=rust_discriminant.discriminant_size
+    )
+    for rust_variant in rust_variants:
+        # The discriminant value used to represent each variant
+        # does not necessarily match the ordering of those variants
+        # in the type layout information, i.e. the first variant
+        # is not necessarily discriminant value 0, etc.
+        # The information emitted by rustc's `print-type-sizes` flag
+        # also does not include the discriminant value for each variant.
+        # Therefore, all variants are assigned a discriminant value of -1.
+        bn_discriminant_enum.append(rust_variant.variant_name, -1)
+
+    return bn_discriminant_enum.immutable_copy()
+
+
+def _create_bn_types_for_rust_type(
+    rust_type: RustType,
+    type_graph: Optional[TypeGraph] = None,
+    overlay_enum_variants: bool = False,
+) -> List[TypeDefinition]:
     """
     Note that for Rust enums, i.e. `RustType`s which hold
     a `Discriminant` and `Variant`(s),
@@ -63,107 +216,324 @@ def _create_bn_types_for_rust_type(bv: BinaryView, rust_type: RustType):
     - A new struct type containing:
         - The enum type for the discriminant.
         - A union whose members are the struct types for each variant.
+
+    The types are only built in memory, and are returned in the order
+    in which they should be defined; references between them are
+    created by name, so no types need to exist on the BinaryView yet.
+
+    If `type_graph` is given, fields whose type it can determine refer to
+    the Binary Ninja type for that Rust type by name.
+
+    If `overlay_enum_variants` is set, the union of variant structs starts
+    at the beginning of the enum, overlapping the discriminant, and each
+    variant struct is as large as the whole enum, so that the offsets of
+    the fields in each variant struct are their offsets in the enum.
+    Otherwise, the union starts after the discriminant.
     """
 
-    bn_struct = StructureBuilder.create(packed=True)
+    bn_type_definitions: List[TypeDefinition] = []
+    bn_struct = StructureBuilder.create(packed=True, width=rust_type.type_size)
     rust_field_types = [type(field) for field in rust_type.fields]
 
     # The Rust type is a sum type, i.e. a Rust enum.
     if Variant in rust_field_types:
-        # TODO: Handle repr(C) unions correctly;
-        # it seems these are not being created with the correct size.
-        # For example, see SocketAddrCRepr:
-        # https://github.com/rust-lang/rust/blob/8a778ca1e35e4a8df95c00d800100d95e63e7722/library/std/src/sys_common/net.rs#L725
         bn_variants_union = StructureBuilder.create(
             packed=True, type=StructureVariant.UnionStructureType
         )
 
+        rust_variants = [
+            rust_type_field
+            for rust_type_field in rust_type.fields
+            if isinstance(rust_type_field, Variant)
+        ]
+
         # It is possible to have a sum type with variants, but with no discriminant.
-        bn_discriminant_enum_name: Optional[str] = None
+        # The variants are placed after the discriminant, if there is one.
+        discriminant_size = 0
         for rust_type_field in rust_type.fields:
             if isinstance(rust_type_field, Discriminant):
                 bn_discriminant_enum_name = f"{rust_type.type_name}::discriminant"
-                bn_discriminant_enum = EnumerationBuilder.create(
-                    width=rust_type_field.discriminant_size
+                bn_discriminant_enum = _create_discriminant_enum(
+                    rust_type_field, rust_variants
                 )
 
-                bv.define_user_type(
-                    name=bn_discriminant_enum_name,
-                    type_obj=bn_discriminant_enum,
+                bn_type_definitions.append(
+                    (bn_discriminant_enum_name, bn_discriminant_enum)
                 )
-                bn_struct.append(
-                    type=Type.named_type_from_registered_type(
-                        view=bv,
+                bn_struct.insert(
+                    0,
+                    Type.named_type_from_type(
                         name=bn_discriminant_enum_name,
+                        type=bn_discriminant_enum,
                     ),
-                    name="discriminant",
+                    "discriminant",
                 )
+                discriminant_size = rust_type_field.discriminant_size
             elif isinstance(rust_type_field, Variant):
                 bn_variant_struct_name = (
                     f"{rust_type.type_name}::{rust_type_field.variant_name}"
                 )
-                bn_variant_struct = _create_variant_struct(rust_type_field)
-
-                bv.define_user_type(
-                    name=bn_variant_struct_name,
-                    type_obj=bn_variant_struct,
+                bn_variant_struct = _create_variant_struct(
+                    rust_type,
+                    rust_type_field,
+                    type_graph,
+                    discriminant_size,
+                    overlay_enum_variants,
                 )
+
+                bn_type_definitions.append((bn_variant_struct_name, bn_variant_struct))
                 bn_variants_union.append(
-                    type=Type.named_type_from_registered_type(
-                        view=bv,
+                    type=Type.named_type_from_type(
                         name=bn_variant_struct_name,
+                        type=bn_variant_struct,
                     ),
                     name=rust_type_field.variant_name,
                 )
-                if bn_discriminant_enum_name is not None:
-                    # Modify the existing discriminant enum type
-                    # to add an entry for this variant.
-                    with Type.builder(
-                        bv=bv,
-                        name=QualifiedName(bn_discriminant_enum_name),
-                    ) as bn_discriminant_enum:
-                        # The discriminant value used to represent each variant
-                        # does not necessarily match the ordering of those variants
-                        # in the type layout information, i.e. the first variant
-                        # is not necessarily discriminant value 0, etc.
-                        # The information emitted by rustc's `print-type-sizes` flag
-                        # also does not include the discriminant value for each variant.
-                        # Therefore, all variants are assigned a discriminant value of -1.
-                        bn_discriminant_enum.append(rust_type_field.variant_name, -1)
-
-        bn_struct.append(
-            type=bn_variants_union,
-            name=f"{rust_type.type_name}::variants",
+
+        bn_variants_union_offset = 0 if overlay_enum_variants else discriminant_size
+        end_offset = bn_variants_union_offset + bn_variants_union.width
+        bn_struct.insert(
+            bn_variants_union_offset,
+            bn_variants_union,
+            f"{rust_type.type_name}::variants",
+            overwrite_existing=False,
         )
 
     # The Rust type is a product type, i.e. a Rust struct.
     else:
-        for rust_type_field in rust_type.fields:
-            if isinstance(rust_type_field, Field):
-                bn_field_type = _create_bn_type_from_field_size(
-                    rust_type_field.field_size
-                )
-                bn_struct.append(type=bn_field_type, name=rust_type_field.field_name)
-            elif isinstance(rust_type_field, Padding):
-                bn_field_type = _create_bn_type_from_field_size(
-                    rust_type_field.padding_size
-                )
-                bn_struct.append(type=bn_field_type, name="_padding")
+        end_offset = _insert_bn_fields(
+            bn_struct,
+            rust_type,
+            rust_type.fields,
+            None,
+            type_graph,
+            f"Rust type {rust_type.type_name}",
+        )
 
-    if bn_struct.width != rust_type.type_size:
+    if end_offset > rust_type.type_size or (
+        Variant not in rust_field_types and end_offset != rust_type.type_size
+    ):
         logger.log_error(
-            f"Created struct for Rust type {rust_type.type_name} has size ({bn_struct.width} bytes) which does not match size of parsed Rust type ({rust_type.type_size} bytes)"
+            f"Fields of Rust type {rust_type.type_name} end at {end_offset} bytes, which does not match its size ({rust_type.type_size} bytes)"
         )
 
-    bv.define_user_type(name=rust_type.type_name, type_obj=bn_struct)
+    bn_type_definitions.append((rust_type.type_name, bn_struct.immutable_copy()))
+    return bn_type_definitions
+
+
+def _define_bn_types(
+    bv: BinaryView,
+    bn_type_definitions: List[TypeDefinition],
+    progress_func: Optional[ProgressFunc] = None,
+) -> bool:
+    """
+    Returns `False` if defining the types was stopped by `progress_func`.
+    """
+    completed = True
+
+    def update_progress(defined_type_count: int, total_type_count: int) -> bool:
+        nonlocal completed
+        if progress_func is not None and not progress_func(
+            defined_type_count, total_type_count
+        ):
+            completed = False
+        return completed
+
+    # `BinaryView.define_user_types` defines all of the types in a single call
+    # into the core, but is only available in newer versions of Binary Ninja.
+    # Otherwise, define the types one at a time, but as a single undo action.
+    if hasattr(bv, "define_user_types"):
+        bv.define_user_types(bn_type_definitions, update_progress)
+    else:
+        bv.begin_undo_actions()
+        bn_type_count = len(bn_type_definitions)
+        for bn_type_index, (bn_type_name, bn_type) in enumerate(bn_type_definitions):
+            if not update_progress(bn_type_index, bn_type_count):
+                break
+            bv.define_user_type(name=bn_type_name, type_obj=bn_type)
+        bv.commit_undo_actions()
+
+    return completed
+
+
+def _load_imported_types_metadata(
+    bv: BinaryView, overlay_enum_variants: bool
+) -> Dict[str, Dict]:
+    try:
+        metadata = bv.query_metadata(IMPORTED_TYPES_METADATA_KEY)
+    except KeyError:
+        return {}
+
+    # Types imported by other versions of this plugin, or with a different
+    # enum layout, are always redefined.
+    if (
+        not isinstance(metadata, dict)
+        or metadata.get("version") != IMPORTER_VERSION
+        or metadata.get("overlay_enum_variants", False) != overlay_enum_variants
+    ):
+        return {}
+    return metadata["types"]
 
 
 def create_binary_view_types(
     bv: BinaryView,
-    rust_types: List[RustType],
+    rust_types: Iterable[RustType],
+    progress_func: Optional[ProgressFunc] = None,
+    remove_vanished_types: bool = False,
+    type_filter: Optional[TypeFilter] = None,
+    resolve_field_types: bool = True,
+    overlay_enum_variants: bool = False,
+    is_cancelled: Optional[Callable[[], bool]] = None,
 ):
-    for rust_type in rust_types:
-        _create_bn_types_for_rust_type(bv=bv, rust_type=rust_type)
+    """
+    Create Binary Ninja types for all of the given Rust types.
+    If `type_filter` is given, only the Rust types whose names it accepts
+    are imported; see `parse.type_name_filter`.
+
+    If `resolve_field_types` is set, fields which hold another of the
+    imported Rust types (see `type_graph.TypeGraph`) refer to its Binary
+    Ninja type, and each type is defined after the types it refers to.
+    Otherwise, every field is an integer or array of its size.
+    For `overlay_enum_variants`, see `_create_bn_types_for_rust_type`.
+
+    A fingerprint of each imported Rust type's layout is recorded in the
+    BinaryView's metadata. When types are imported again, only the Rust
+    types whose layout changed since the last import are redefined.
+    If `remove_vanished_types` is set, the Binary Ninja types created
+    for previously imported Rust types which are not in `rust_types`
+    are removed.
+
+    `progress_func` is called with the number of Binary Ninja types defined
+    so far and the total number of types to define; if it returns `False`,
+    no further types are defined. `is_cancelled` is called before building
+    the Binary Ninja types for each Rust type; if it returns `True`, no
+    types are defined at all.
+    """
+    previously_imported_types = _load_imported_types_metadata(bv, overlay_enum_variants)
+    imported_types: Dict[str, Dict] = {}
+    bn_type_definitions: List[TypeDefinition] = []
+    stale_bn_type_names: List[str] = []
+    unchanged_type_count = 0
+
+    if type_filter is not None:
+        rust_types = (
+            rust_type for rust_type in rust_types if type_filter(rust_type.type_name)
+        )
+    type_graph = TypeGraph(rust_types)
+    if resolve_field_types:
+        ordered_rust_types = type_graph.topological_order()
+    else:
+        ordered_rust_types = list(type_graph.types.values())
+
+    for rust_type in ordered_rust_types:
+        # Stop between types, rather than in the middle of one.
+        if is_cancelled is not None and is_cancelled():
+            return
+        fingerprint = layout_fingerprint(rust_type)
+        dependencies = (
+            type_graph.dependencies(rust_type.type_name) if resolve_field_types else []
+        )
+        previous_import = previously_imported_types.get(rust_type.type_name)
+        if (
+            previous_import is not None
+            and previous_import["fingerprint"] == fingerprint
+            and previous_import["dependencies"] == dependencies
+            # The type may have been deleted by the user since it was imported.
+            and bv.get_type_by_name(rust_type.type_name) is not None
+        ):
+            imported_types[rust_type.type_name] = previous_import
+            unchanged_type_count += 1
+            continue
+
+        rust_type_bn_type_definitions = _create_bn_types_for_rust_type(
+            rust_type=rust_type,
+            type_graph=type_graph if resolve_field_types else None,
+            overlay_enum_variants=overlay_enum_variants,
+        )
+        bn_type_definitions.extend(rust_type_bn_type_definitions)
+        imported_types[rust_type.type_name] = {
+            "fingerprint": fingerprint,
+            "dependencies": dependencies,
+            "bn_type_names": [
+                bn_type_name for bn_type_name, _ in rust_type_bn_type_definitions
+            ],
+        }
+        # For example, the struct for a variant which a Rust enum no longer has.
+        if previous_import is not None:
+            stale_bn_type_names.extend(previous_import["bn_type_names"])
+
+    for rust_type_name, previous_import in previously_imported_types.items():
+        if rust_type_name in imported_types:
+            continue
+        if remove_vanished_types:
+            stale_bn_type_names.extend(previous_import["bn_type_names"])
+        else:
+            imported_types[rust_type_name] = previous_import
+
+    if not _define_bn_types(
+        bv=bv, bn_type_definitions=bn_type_definitions, progress_func=progress_func
+    ):
+        # Leave the recorded fingerprints as they were,
+        # so that the next import redefines any types which were not defined.
+        return
+
+    defined_bn_type_names = {bn_type_name for bn_type_name, _ in bn_type_definitions}
+    removed_bn_type_names = set(stale_bn_type_names) - defined_bn_type_names
+    for bn_type_name in removed_bn_type_names:
+        bv.undefine_user_type(bn_type_name)
+
+    bv.store_metadata(
+        IMPORTED_TYPES_METADATA_KEY,
+        {
+            "version": IMPORTER_VERSION,
+            "overlay_enum_variants": overlay_enum_variants,
+            "types": imported_types,
+        },
+    )
+
+    logger.log_info(
+        f"Defined {len(bn_type_definitions)} Binary Ninja types, skipped {unchanged_type_count} unchanged Rust types, and removed {len(removed_bn_type_names)} Binary Ninja types"
+    )
 
     # TODO: If every variant is zero-sized, it can be an enum.
     # The discriminant size is then used to calculate the enum width.
+
+
+def create_type_library(
+    rust_types: Iterable[RustType],
+    name: str,
+    platform: Platform,
+    type_filter: Optional[TypeFilter] = None,
+    resolve_field_types: bool = True,
+    overlay_enum_variants: bool = False,
+) -> TypeLibrary:
+    """
+    Create a Binary Ninja type library for `platform` containing the types
+    for all of the given Rust types, as `create_binary_view_types` would
+    define them on a BinaryView.
+
+    Once written to a .bntl file, the type library can be attached to any
+    number of BinaryViews, each of which then only imports the types which
+    are actually used, as they are referenced.
+    """
+    if type_filter is not None:
+        rust_types = (
+            rust_type for rust_type in rust_types if type_filter(rust_type.type_name)
+        )
+    type_graph = TypeGraph(rust_types)
+    if resolve_field_types:
+        ordered_rust_types = type_graph.topological_order()
+    else:
+        ordered_rust_types = list(type_graph.types.values())
+
+    type_library = TypeLibrary.new(platform.arch, name)
+    type_library.add_platform(platform)
+    for rust_type in ordered_rust_types:
+        for bn_type_name, bn_type in _create_bn_types_for_rust_type(
+            rust_type=rust_type,
+            type_graph=type_graph if resolve_field_types else None,
+            overlay_enum_variants=overlay_enum_variants,
+        ):
+            type_library.add_named_type(bn_type_name, bn_type)
+    type_library.finalize()
+    return type_library
@@ -0,0 +1,255 @@
+import hashlib
+import marshal
+import os
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .parse import (
+    PARSER_VERSION,
+    Discriminant,
+    Field,
+    MalformedRecord,
+    OnError,
+    Padding,
+    Type,
+    TypeFilter,
+    Variant,
+    iter_parse_path,
+)
+
+# Incremented whenever the on-disk encoding below changes.
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_MAX_CACHE_SIZE_BYTES = 1024 * 1024 * 1024
+
+_CACHE_FILE_SUFFIX = ".types"
+
+# Parsed types are stored as nested tuples of builtin types, serialized with
+# `marshal`; this is much more compact and faster to load than pickling the
+# dataclasses themselves. Each field-like record is tagged with its kind.
+_FIELD_TAG = 0
+_PADDING_TAG = 1
+_DISCRIMINANT_TAG = 2
+_VARIANT_TAG = 3
+
+
+def _encode_field(field: Union[Field, Padding, Discriminant, Variant]) -> Tuple:
+    if isinstance(field, Field):
+        return (
+            _FIELD_TAG,
+            field.field_name,
+            field.field_size,
+            field.field_offset_bytes,
+            field.field_alignment_bytes,
+        )
+    elif isinstance(field, Padding):
+        return (_PADDING_TAG, field.padding_size)
+    elif isinstance(field, Discriminant):
+        return (_DISCRIMINANT_TAG, field.discriminant_size)
+    else:
+        return (
+            _VARIANT_TAG,
+            field.variant_name,
+            field.variant_size,
+            None
+            if field.fields is None
+            else tuple(_encode_field(variant_field) for variant_field in field.fields),
+        )
+
+
+def _decode_field(encoded_field: Tuple) -> Any:
+    tag = encoded_field[0]
+    if tag == _FIELD_TAG:
+        return Field(*encoded_field[1:])
+    elif tag == _PADDING_TAG:
+        return Padding(encoded_field[1])
+    elif tag == _DISCRIMINANT_TAG:
+        return Discriminant(encoded_field[1])
+    elif tag == _VARIANT_TAG:
+        _, variant_name, variant_size, encoded_variant_fields = encoded_field
+        return Variant(
+            variant_name=variant_name,
+            variant_size=variant_size,
+            fields=None
+            if encoded_variant_fields is None
+            else [
+                _decode_field(variant_field) for variant_field in encoded_variant_fields
+            ],
+        )
+    else:
+        raise ValueError(f"Unknown cached field tag {tag}")
+
+
+def _encode_types(rust_types: List[Type]) -> bytes:
+    return marshal.dumps(
+        tuple(
+            (
+                rust_type.type_name,
+                rust_type.type_size,
+                rust_type.type_alignment_bytes,
+                tuple(_encode_field(field) for field in rust_type.fields),
+            )
+            for rust_type in rust_types
+        )
+    )
+
+
+def _decode_types(data: bytes) -> List[Type]:
+    return [
+        Type(
+            type_name=type_name,
+            type_size=type_size,
+            type_alignment_bytes=type_alignment_bytes,
+            fields=[_decode_field(field) for field in encoded_fields],
+        )
+        for type_name, type_size, type_alignment_bytes, encoded_fields in marshal.loads(
+            data
+        )
+    ]
+
+
+def cache_key(path: Union[str, "os.PathLike[str]"]) -> str:
+    """
+    Compute the cache key for a type layout file, from a hash of its contents,
+    the parser version, and the cache format version.
+    """
+    content_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            content_hash.update(block)
+    return f"{content_hash.hexdigest()}-p{PARSER_VERSION}-f{CACHE_FORMAT_VERSION}"
+
+
+def load_cached_types(cache_directory: Path, key: str) -> Optional[List[Type]]:
+    """
+    Load the parsed types stored under `key`,
+    or return `None` if they are not in the cache.
+    """
+    cache_file_path = cache_directory / (key + _CACHE_FILE_SUFFIX)
+    try:
+        data = cache_file_path.read_bytes()
+    except OSError:
+        return None
+
+    try:
+        rust_types = _decode_types(data)
+    except (EOFError, TypeError, ValueError):
+        # The cache file is corrupt; it will be overwritten with a fresh parse.
+        return None
+
+    # Mark the cache file as recently used, for eviction.
+    try:
+        os.utime(cache_file_path)
+    except OSError:
+        # The cache may be read-only; the types are still usable.
+        pass
+    return rust_types
+
+
+def _evict_cached_types(cache_directory: Path, max_cache_size_bytes: int):
+    cache_file_stats = []
+    for cache_file_path in cache_directory.glob("*" + _CACHE_FILE_SUFFIX):
+        try:
+            cache_file_stats.append((cache_file_path, cache_file_path.stat()))
+        except OSError:
+            continue
+
+    # Evict the least recently used cache files first.
+    cache_file_stats.sort(key=lambda path_and_stat: path_and_stat[1].st_mtime)
+    cache_size_bytes = sum(stat.st_size for _, stat in cache_file_stats)
+    for cache_file_path, stat in cache_file_stats:
+        if cache_size_bytes <= max_cache_size_bytes:
+            break
+        try:
+            cache_file_path.unlink()
+        except OSError:
+            continue
+        cache_size_bytes -= stat.st_size
+
+
+def store_cached_types(
+    cache_directory: Path,
+    key: str,
+    rust_types: List[Type],
+    max_cache_size_bytes: int = DEFAULT_MAX_CACHE_SIZE_BYTES,
+):
+    """
+    Store parsed types under `key`, then evict the least recently used
+    entries until the cache is no larger than `max_cache_size_bytes`.
+    """
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    cache_file_path = cache_directory / (key + _CACHE_FILE_SUFFIX)
+    # Write to a temporary file first, so that a partially written
+    # cache file is never read.
+    temporary_cache_file_path = cache_file_path.with_suffix(".tmp")
+    temporary_cache_file_path.write_bytes(_encode_types(rust_types))
+    os.replace(temporary_cache_file_path, cache_file_path)
+
+    _evict_cached_types(cache_directory, max_cache_size_bytes)
+
+
+def cached_parse_path(
+    path: Union[str, "os.PathLike[str]"],
+    cache_directory: Path,
+    max_cache_size_bytes: int = DEFAULT_MAX_CACHE_SIZE_BYTES,
+    type_filter: Optional[TypeFilter] = None,
+    on_error: Optional[OnError] = None,
+    track_parsed_types: Optional[Callable[[Iterable[Type]], Iterable[Type]]] = None,
+) -> List[Type]:
+    """
+    Like `parse_path`, but reuse the result of a previous parse of a file
+    with the same contents, if one is in the cache in `cache_directory`.
+
+    The cache holds every type in a file, so on a cache hit, the cached
+    types are filtered by `type_filter`. On a cache miss, types excluded by
+    `type_filter` are skipped while parsing, and the result is only cached
+    if there is no `type_filter`.
+
+    The parsed types, but not cached types, are passed through
+    `track_parsed_types`, e.g. to report progress; it may stop early,
+    e.g. when cancelled. Only the result of a complete parse with no
+    malformed records (see `parse.iter_parse`) is cached. Failures to write
+    to the cache are ignored.
+    """
+    key = cache_key(path)
+    cached_rust_types = load_cached_types(cache_directory, key)
+    if cached_rust_types is not None:
+        if type_filter is None:
+            return cached_rust_types
+        return [
+            rust_type
+            for rust_type in cached_rust_types
+            if type_filter(rust_type.type_name)
+        ]
+
+    complete = False
+    malformed = False
+
+    def report_malformed_record(error: MalformedRecord):
+        nonlocal malformed
+        malformed = True
+        on_error(error)  # type: ignore
+
+    def iter_rust_types() -> Iterator[Type]:
+        nonlocal complete
+        yield from iter_parse_path(
+            path,
+            type_filter=type_filter,
+            on_error=None if on_error is None else report_malformed_record,
+        )
+        complete = True
+
+    rust_types: Iterable[Type] = iter_rust_types()
+    if track_parsed_types is not None:
+        rust_types = track_parsed_types(rust_types)
+    parsed_rust_types = list(rust_types)
+    if complete and not malformed and type_filter is None:
+        try:
+            store_cached_types(
+                cache_directory, key, parsed_rust_types, max_cache_size_bytes
+            )
+        except OSError:
+            # A cache which cannot be written, e.g. on a full or read-only
+            # disk, does not stop the parsed types from being used.
+            pass
+    return parsed_rust_types
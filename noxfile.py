@@ -22,3 +22,11 @@ def test(session):
     session.install("-r", "requirements.txt")
 
     session.run("pytest", "-vv", ".")
+
+
+@nox.session
+def benchmark(session):
+    session.install("-r", "dev-requirements.txt")
+    session.install("-r", "requirements.txt")
+
+    session.run("pytest", "-s", "--run-benchmarks", "-m", "benchmark", ".")
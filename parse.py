@@ -1,20 +1,70 @@
+import fnmatch
+import hashlib
+import heapq
+import io
+import json
+import mmap
+import os
+import re
 import string
+import subprocess
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional, TextIO, Union
+from functools import lru_cache, partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 from pyparsing import (
     Keyword,
     Literal,
     Opt,
+    ParseException,
     ParserElement,
     Word,
     ZeroOrMore,
+    lineno,
     nums,
 )
 
+ENGINE_PYPARSING = "pyparsing"
+ENGINE_FAST = "fast"
+ENGINES = (ENGINE_PYPARSING, ENGINE_FAST)
+
+# Incremented whenever a change to the parser changes the parsed `Type`s
+# for the same input, so that cached parse results are not reused.
+PARSER_VERSION = 1
+
+# Decides whether the type with the given name should be parsed.
+TypeFilter = Callable[[str], bool]
+
 
+# The record types below declare `__slots__`, so that instances do not
+# carry a per-instance `__dict__`; large dumps contain millions of fields.
 @dataclass
 class Field:
+    __slots__ = (
+        "field_name",
+        "field_size",
+        "field_offset_bytes",
+        "field_alignment_bytes",
+    )
     field_name: str
     field_size: int
     field_offset_bytes: Optional[int]
@@ -23,16 +73,19 @@ class Field:
 
 @dataclass
 class Padding:
+    __slots__ = ("padding_size",)
     padding_size: int
 
 
 @dataclass
 class Discriminant:
+    __slots__ = ("discriminant_size",)
     discriminant_size: int
 
 
 @dataclass
 class Variant:
+    __slots__ = ("variant_name", "variant_size", "fields")
     variant_name: str
     variant_size: int
     fields: Optional[List[Union[Field, Padding]]]
@@ -40,14 +93,63 @@ class Variant:
 
 @dataclass
 class Type:
+    __slots__ = ("type_name", "type_size", "type_alignment_bytes", "fields")
     type_name: str
     type_size: int
     type_alignment_bytes: int
     fields: List[Union[Field, Padding, Discriminant, Variant]]
 
 
+@dataclass
+class MalformedRecord:
+    """
+    A malformed line, reported instead of raising `ParseException` when
+    parsing with an `on_error` callback. The rest of the record containing
+    the line is skipped, up to the next type line.
+    """
+
+    __slots__ = ("line_number", "line", "type_name")
+    line_number: int
+    line: str
+    # The name of the type whose record was skipped, if its type line was
+    # well-formed.
+    type_name: Optional[str]
+
+
+# Called with each malformed record which is skipped.
+OnError = Callable[[MalformedRecord], None]
+
+
+class _OffsetParseException(ParseException):
+    """
+    A `ParseException` in part of a larger input, such as a single line or
+    type record, whose line number is within the whole input.
+    """
+
+    def __init__(
+        self,
+        pstr: str,
+        loc: int = 0,
+        msg: Optional[str] = None,
+        elem=None,
+        first_line_number: int = 1,
+    ):
+        super().__init__(pstr, loc, msg, elem)
+        self.first_line_number = first_line_number
+
+    @property
+    def lineno(self) -> int:
+        return lineno(self.loc, self.pstr) + self.first_line_number - 1
+
+
+# Every line begins with the same `print-type-size` marker. The grammar for
+# each kind of line below excludes the marker, so that it is matched once
+# per line, rather than once per alternative tried for the line.
+def _line_marker() -> ParserElement:
+    return Keyword("print-type-size").suppress()
+
+
 def _type_definition_line() -> ParserElement:
-    line_marker = Keyword("print-type-size")
     type_marker = Keyword("type:")
     name = (
         Literal("`")
@@ -67,14 +169,18 @@ def _type_definition_line() -> ParserElement:
     alignment_information = alignment_marker + alignment_bytes
 
     type_definition = (
-        line_marker + type_marker + name + size + Literal(",") + alignment_information
+        _line_marker()
+        + type_marker
+        + name
+        + size
+        + Literal(",")
+        + alignment_information
     )
 
     return type_definition
 
 
-def _field_definition_line() -> ParserElement:
-    line_marker = Keyword("print-type-size")
+def _field_definition() -> ParserElement:
     field_marker = Keyword("field")
     name = (
         Literal("`")
@@ -95,8 +201,7 @@ def _field_definition_line() -> ParserElement:
     alignment_information = alignment_marker + alignment_bytes
 
     field_definition = (
-        line_marker
-        + field_marker
+        field_marker
         + name
         + size
         + Opt(Literal(",") + offset_information)
@@ -117,12 +222,11 @@ def _field_definition_line() -> ParserElement:
     return field_definition
 
 
-def _padding_definition_line() -> ParserElement:
-    line_marker = Keyword("print-type-size")
+def _padding_definition() -> ParserElement:
     padding_marker = Keyword("padding:")
     size = Word(nums).set_results_name("padding_size") + Keyword("bytes")
 
-    padding_definition = line_marker + padding_marker + size
+    padding_definition = padding_marker + size
 
     padding_definition.set_parse_action(
         lambda results: Padding(int(results.padding_size))  # type: ignore
@@ -131,12 +235,11 @@ def _padding_definition_line() -> ParserElement:
     return padding_definition
 
 
-def _end_padding_definition_line() -> ParserElement:
-    line_marker = Keyword("print-type-size")
+def _end_padding_definition() -> ParserElement:
     padding_marker = Keyword("end padding:")
     size = Word(nums).set_results_name("padding_size") + Keyword("bytes")
 
-    padding_definition = line_marker + padding_marker + size
+    padding_definition = padding_marker + size
 
     padding_definition.set_parse_action(
         lambda results: Padding(int(results.padding_size))  # type: ignore
@@ -145,8 +248,7 @@ def _end_padding_definition_line() -> ParserElement:
     return padding_definition
 
 
-def _variant_definition_line() -> ParserElement:
-    line_marker = Keyword("print-type-size")
+def _variant_definition() -> ParserElement:
     variant_marker = Keyword("variant")
     name = (
         Literal("`")
@@ -156,17 +258,16 @@ def _variant_definition_line() -> ParserElement:
     )
     size = Word(nums).set_results_name("variant_size") + Keyword("bytes")
 
-    variant_definition = line_marker + variant_marker + name + size
+    variant_definition = variant_marker + name + size
 
     return variant_definition
 
 
-def _discriminant_definition_line() -> ParserElement:
-    line_marker = Keyword("print-type-size")
+def _discriminant_definition() -> ParserElement:
     discriminant_marker = Keyword("discriminant:")
     size = Word(nums).set_results_name("discriminant_size") + Keyword("bytes")
 
-    discriminant_definition = line_marker + discriminant_marker + size
+    discriminant_definition = discriminant_marker + size
 
     discriminant_definition.set_parse_action(
         lambda results: Discriminant(int(results.discriminant_size))  # type: ignore
@@ -176,11 +277,12 @@ def _discriminant_definition_line() -> ParserElement:
 
 
 def _variant() -> ParserElement:
-    variant = _variant_definition_line() + ZeroOrMore(
-        _field_definition_line()
-        | _padding_definition_line()
-        | _end_padding_definition_line()
-    ).set_results_name("fields")
+    variant_field = _line_marker() + (
+        _field_definition() | _padding_definition() | _end_padding_definition()
+    )
+    variant = _variant_definition() + ZeroOrMore(variant_field).set_results_name(
+        "fields"
+    )
 
     variant.set_parse_action(
         lambda results: Variant(
@@ -193,14 +295,26 @@ def _variant() -> ParserElement:
     return variant
 
 
-def parse(data: TextIO) -> List:
-    type_definition = _type_definition_line() + ZeroOrMore(
-        _field_definition_line()
-        | _padding_definition_line()
-        | _end_padding_definition_line()
-        | _discriminant_definition_line()
+@lru_cache(maxsize=None)
+def _type() -> ParserElement:
+    """
+    The grammar for a single type record, which is only built once.
+
+    Packrat parsing is deliberately not enabled: with the line marker
+    factored out, each line is matched by trying each alternative at most
+    once, so memoization only adds overhead. On tests/data/print-type-sizes.txt
+    it made parsing more than twice as slow.
+    """
+    type_field = _line_marker() + (
+        _field_definition()
+        | _padding_definition()
+        | _end_padding_definition()
+        | _discriminant_definition()
         | _variant()
-    ).set_results_name("fields")
+    )
+    type_definition = _type_definition_line() + ZeroOrMore(type_field).set_results_name(
+        "fields"
+    )
 
     type_definition.set_parse_action(
         lambda results: Type(
@@ -211,8 +325,1101 @@ def parse(data: TextIO) -> List:
         )
     )
 
-    types = ZeroOrMore(type_definition)
-    return types.parse_file(data, parse_all=True).as_list()
+    return type_definition
+
+
+@lru_cache(maxsize=None)
+def _types() -> ParserElement:
+    return ZeroOrMore(_type())
+
+
+def _parse_pyparsing(data: TextIO) -> List:
+    return _types().parse_file(data, parse_all=True).as_list()
+
+
+_type_start_re = re.compile(r"\s*print-type-size\s+type:")
+
+
+def _iter_type_records(data: Iterable[str]) -> Iterator[List[str]]:
+    """
+    Split the input into the lines making up each type record.
+    Every type record begins with a `print-type-size type:` line;
+    any lines before the first such line are returned as their own record.
+    """
+    record: List[str] = []
+    for line in data:
+        if _type_start_re.match(line) is not None and record:
+            yield record
+            record = []
+        record.append(line)
+    if record:
+        yield record
+
+
+def _iter_parse_pyparsing(
+    data: TextIO,
+    type_filter: Optional[TypeFilter] = None,
+    on_error: Optional[OnError] = None,
+    first_line_number: int = 1,
+) -> Iterator[Type]:
+    type_definition = _type()
+    record_first_line_number = first_line_number
+    for record in _iter_type_records(data):
+        line_number = record_first_line_number
+        record_first_line_number += len(record)
+
+        type_line_match = _FAST_GRAMMAR.type_line.search(record[0])
+        if type_filter is not None:
+            if type_line_match is not None and not type_filter(
+                type_line_match.group(1)
+            ):
+                continue
+        record_text = "".join(record)
+        if not record_text.strip():
+            continue
+        try:
+            yield type_definition.parse_string(record_text, parse_all=True)[0]
+        except ParseException as err:
+            # The exception's line number is within the record; report its
+            # line number within the whole input instead. If the type line
+            # itself is malformed, the grammar may only fail on a later,
+            # well-formed line, so the type line is reported.
+            error = _OffsetParseException(
+                err.pstr,
+                err.loc if type_line_match is not None else 0,
+                err.msg,
+                err.parser_element,
+                first_line_number=line_number,
+            )
+            if on_error is None:
+                raise error from err
+            on_error(
+                MalformedRecord(
+                    line_number=error.lineno,
+                    line=error.line,
+                    type_name=None
+                    if type_line_match is None
+                    else type_line_match.group(1),
+                )
+            )
+
+
+# The "fast" engine below is a hand-written, single-pass alternative to the
+# pyparsing grammar above. Every line of `-Zprint-type-sizes` output is a
+# complete record, so instead of backtracking through alternations we match
+# each line against one regular expression per record kind, and track the
+# type and variant currently being built.
+# The regular expressions mirror the pyparsing grammar; in particular, names
+# may contain any character other than a backtick.
+# The same regular expressions are also compiled for bytes, for scanning
+# memory-mapped files without decoding them; see `parse_path`.
+_LINE_MARKER = "print-type-size"
+_TYPE_LINE_PATTERN = (
+    r"type:\s*`([^`]+)`\s*:\s*(\d+)\s+bytes\s*,\s*alignment:\s*(\d+)\s+bytes"
+)
+_FIELD_LINE_PATTERN = (
+    r"field\s*`([^`]+)`\s*:\s*(\d+)\s+bytes"
+    r"(?:\s*,\s*offset:\s*(\d+)\s+bytes)?"
+    r"(?:\s*,\s*alignment:\s*(\d+)\s+bytes)?"
+)
+_PADDING_LINE_PATTERN = r"(?:end )?padding:\s*(\d+)\s+bytes"
+_VARIANT_LINE_PATTERN = r"variant\s*`([^`]+)`\s*:\s*(\d+)\s+bytes"
+_DISCRIMINANT_LINE_PATTERN = r"discriminant:\s*(\d+)\s+bytes"
+
+
+class _FastGrammar(NamedTuple):
+    line_marker: Any
+    type_marker: Any
+    type_line: Pattern
+    field_line: Pattern
+    padding_line: Pattern
+    variant_line: Pattern
+    discriminant_line: Pattern
+    # Converts a matched name, or a whole line, to a `str`.
+    decode: Callable[[Any], str]
+
+
+_FAST_GRAMMAR = _FastGrammar(
+    line_marker=_LINE_MARKER,
+    type_marker="type:",
+    type_line=re.compile(_TYPE_LINE_PATTERN),
+    field_line=re.compile(_FIELD_LINE_PATTERN),
+    padding_line=re.compile(_PADDING_LINE_PATTERN),
+    variant_line=re.compile(_VARIANT_LINE_PATTERN),
+    discriminant_line=re.compile(_DISCRIMINANT_LINE_PATTERN),
+    decode=str,
+)
+
+_FAST_BYTES_GRAMMAR = _FastGrammar(
+    line_marker=_LINE_MARKER.encode(),
+    type_marker=b"type:",
+    type_line=re.compile(_TYPE_LINE_PATTERN.encode()),
+    field_line=re.compile(_FIELD_LINE_PATTERN.encode()),
+    padding_line=re.compile(_PADDING_LINE_PATTERN.encode()),
+    variant_line=re.compile(_VARIANT_LINE_PATTERN.encode()),
+    discriminant_line=re.compile(_DISCRIMINANT_LINE_PATTERN.encode()),
+    decode=lambda data: data.decode("utf-8"),
+)
+
+
+def _fast_parse_error(line: str, line_number: int) -> ParseException:
+    return _OffsetParseException(
+        line,
+        0,
+        f"Unrecognized print-type-size record on line {line_number}",
+        first_line_number=line_number,
+    )
+
+
+def _iter_parse_fast(
+    data: Iterable[Any],
+    first_line_number: int = 1,
+    grammar: _FastGrammar = _FAST_GRAMMAR,
+    type_filter: Optional[TypeFilter] = None,
+    on_error: Optional[OnError] = None,
+) -> Iterator[Type]:
+    decode = grammar.decode
+    current_type: Optional[Type] = None
+    # Matching the pyparsing grammar, once a variant has been seen,
+    # all subsequent fields and padding belong to that variant,
+    # until the next variant, discriminant, or type.
+    current_variant: Optional[Variant] = None
+    # Whether the current type was excluded by `type_filter`, or is malformed.
+    skipping_type = False
+
+    for line_number, line in enumerate(data, start=first_line_number):
+        line_parts = line.split(None, 1)
+        if not line_parts:
+            continue
+        if line_parts[0] == grammar.line_marker and len(line_parts) == 2:
+            record = line_parts[1].rstrip()
+        else:
+            # Not a record at all; the empty record matches nothing below,
+            # so the line is reported as malformed.
+            record = line[:0]
+
+        # The lines of excluded and malformed types are not parsed at all.
+        if skipping_type and not record.startswith(grammar.type_marker):
+            continue
+
+        match = grammar.field_line.fullmatch(record)
+        if match is not None and current_type is not None:
+            field_name, field_size, field_offset, field_alignment = match.groups()
+            field = Field(
+                field_name=decode(field_name),
+                field_size=int(field_size),
+                field_offset_bytes=int(field_offset) if field_offset else None,
+                field_alignment_bytes=int(field_alignment) if field_alignment else None,
+            )
+            if current_variant is not None:
+                current_variant.fields.append(field)  # type: ignore
+            else:
+                current_type.fields.append(field)
+            continue
+
+        match = grammar.type_line.fullmatch(record)
+        if match is not None:
+            if current_type is not None:
+                yield current_type
+            type_name, type_size, type_alignment = match.groups()
+            type_name = decode(type_name)
+            current_variant = None
+            if type_filter is not None and not type_filter(type_name):
+                current_type = None
+                skipping_type = True
+                continue
+            skipping_type = False
+            current_type = Type(
+                type_name=type_name,
+                type_size=int(type_size),
+                type_alignment_bytes=int(type_alignment),
+                fields=[],
+            )
+            continue
+
+        match = grammar.padding_line.fullmatch(record)
+        if match is not None and current_type is not None:
+            padding = Padding(int(match.group(1)))
+            if current_variant is not None:
+                current_variant.fields.append(padding)  # type: ignore
+            else:
+                current_type.fields.append(padding)
+            continue
+
+        match = grammar.variant_line.fullmatch(record)
+        if match is not None and current_type is not None:
+            variant_name, variant_size = match.groups()
+            current_variant = Variant(
+                variant_name=decode(variant_name),
+                variant_size=int(variant_size),
+                fields=[],
+            )
+            current_type.fields.append(current_variant)
+            continue
+
+        match = grammar.discriminant_line.fullmatch(record)
+        if match is not None and current_type is not None:
+            current_type.fields.append(Discriminant(int(match.group(1))))
+            current_variant = None
+            continue
+
+        # A malformed type line still ends the preceding type, which is
+        # complete, rather than being part of it.
+        if record.startswith(grammar.type_marker):
+            if current_type is not None:
+                yield current_type
+            current_type = None
+
+        if on_error is None:
+            raise _fast_parse_error(decode(line), line_number)
+        on_error(
+            MalformedRecord(
+                line_number=line_number,
+                line=decode(line).rstrip("\r\n"),
+                type_name=None if current_type is None else current_type.type_name,
+            )
+        )
+        current_type = None
+        current_variant = None
+        skipping_type = True
+
+    if current_type is not None:
+        yield current_type
+
+
+# The minimum number of lines handed to a worker process at once
+# when parsing in parallel.
+_PARALLEL_CHUNK_LINES = 100000
+
+
+def _iter_record_chunks(
+    data: Iterable[str], chunk_lines: int
+) -> Iterator[Tuple[int, str]]:
+    """
+    Group consecutive type records into chunks of at least `chunk_lines` lines,
+    yielding the line number of the first line of each chunk, and its text.
+    """
+    chunk: List[str] = []
+    chunk_first_line_number = 1
+    for record in _iter_type_records(data):
+        chunk.extend(record)
+        if len(chunk) >= chunk_lines:
+            yield chunk_first_line_number, "".join(chunk)
+            chunk_first_line_number += len(chunk)
+            chunk = []
+    if chunk:
+        yield chunk_first_line_number, "".join(chunk)
+
+
+def _parse_chunk(
+    engine: str, tolerant: bool, chunk: Tuple[int, str]
+) -> Tuple[List, List[MalformedRecord]]:
+    chunk_first_line_number, chunk_text = chunk
+    # Errors are returned to the parent process, which reports them.
+    errors: List[MalformedRecord] = []
+    on_error = errors.append if tolerant else None
+    with io.StringIO(chunk_text) as chunk_data:
+        if engine == ENGINE_FAST:
+            chunk_types = list(
+                _iter_parse_fast(chunk_data, chunk_first_line_number, on_error=on_error)
+            )
+        else:
+            chunk_types = list(
+                _iter_parse_pyparsing(
+                    chunk_data,
+                    on_error=on_error,
+                    first_line_number=chunk_first_line_number,
+                )
+            )
+    return chunk_types, errors
+
+
+def _parse_parallel(
+    data: TextIO,
+    engine: str,
+    workers: int,
+    chunk_lines: int = _PARALLEL_CHUNK_LINES,
+    on_error: Optional[OnError] = None,
+) -> List:
+    types: List[Type] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_types, chunk_errors in executor.map(
+            partial(_parse_chunk, engine, on_error is not None),
+            _iter_record_chunks(data, chunk_lines),
+        ):
+            types.extend(chunk_types)
+            for error in chunk_errors:
+                on_error(error)  # type: ignore
+    return types
+
+
+def parse(
+    data: TextIO,
+    engine: str = ENGINE_PYPARSING,
+    workers: int = 1,
+    on_error: Optional[OnError] = None,
+) -> List:
+    """
+    Parse the output of `rustc -Zprint-type-sizes` into a list of `Type`s.
+
+    `engine` selects the parser implementation: `ENGINE_PYPARSING` uses
+    the pyparsing grammar, while `ENGINE_FAST` uses a single-pass,
+    line-oriented parser which is much faster on large inputs.
+    Both produce identical results, and both raise `ParseException`
+    on malformed input.
+
+    If `on_error` is given, malformed input is tolerated instead: each
+    malformed line is reported to `on_error` as a `MalformedRecord`, and
+    the type record containing it is skipped, resuming at the next
+    `print-type-size type:` line. All well-formed types are returned.
+
+    If `workers` is greater than 1, the input is split into chunks at
+    type boundaries, which are parsed by that many worker processes.
+    The returned types are in the same order as in the input.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown parser engine {engine!r}; expected one of {ENGINES}")
+
+    if workers > 1:
+        return _parse_parallel(data, engine, workers, on_error=on_error)
+    elif engine == ENGINE_PYPARSING and on_error is None:
+        return _parse_pyparsing(data)
+    else:
+        return list(iter_parse(data, engine=engine, on_error=on_error))
+
+
+def iter_parse(
+    data: TextIO,
+    engine: str = ENGINE_PYPARSING,
+    type_filter: Optional[TypeFilter] = None,
+    on_error: Optional[OnError] = None,
+) -> Iterator[Type]:
+    """
+    Incrementally parse the output of `rustc -Zprint-type-sizes`,
+    yielding each `Type` as soon as all of its lines have been read.
+
+    Unlike `parse`, only one type record is held in memory at a time,
+    so arbitrarily large inputs can be processed in bounded memory.
+    Malformed input raises `ParseException` when the offending record
+    is reached, after all preceding types have been yielded.
+
+    If `type_filter` is given, only types whose names it accepts are
+    parsed and yielded; see `type_name_filter`. If `on_error` is given,
+    malformed records are skipped and reported to it; see `parse`.
+    """
+    if engine == ENGINE_PYPARSING:
+        return _iter_parse_pyparsing(data, type_filter=type_filter, on_error=on_error)
+    elif engine == ENGINE_FAST:
+        return _iter_parse_fast(data, type_filter=type_filter, on_error=on_error)
+    else:
+        raise ValueError(f"Unknown parser engine {engine!r}; expected one of {ENGINES}")
+
+
+def iter_parse_path(
+    path: Union[str, "os.PathLike[str]"],
+    type_filter: Optional[TypeFilter] = None,
+    on_error: Optional[OnError] = None,
+) -> Iterator[Type]:
+    """
+    Incrementally parse a file containing the output of `rustc -Zprint-type-sizes`,
+    like `iter_parse` with `ENGINE_FAST`.
+
+    The file is memory-mapped and scanned as bytes; only the type, field
+    and variant names are decoded. This avoids reading a decoded copy of
+    the whole file into memory.
+    """
+    with open(path, "rb") as f:
+        # Empty files cannot be memory-mapped.
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from _iter_parse_fast(
+                iter(data.readline, b""),
+                grammar=_FAST_BYTES_GRAMMAR,
+                type_filter=type_filter,
+                on_error=on_error,
+            )
+
+
+def iter_parse_command(
+    command: Sequence[str],
+    cwd: Optional[Union[str, "os.PathLike[str]"]] = None,
+    env: Optional[Dict[str, str]] = None,
+    stderr: Optional[int] = None,
+    type_filter: Optional[TypeFilter] = None,
+    on_error: Optional[OnError] = None,
+) -> Generator[Type, None, None]:
+    """
+    Run `command`, such as a `cargo +nightly build` with `-Zprint-type-sizes`
+    in its `RUSTFLAGS`, and incrementally parse the output it prints,
+    like `iter_parse` with `ENGINE_FAST`. Each `Type` is yielded as soon as
+    it has been printed, while the command is still running.
+
+    `cwd`, `env` and `stderr` are passed to `subprocess.Popen`.
+    If the command fails, `subprocess.CalledProcessError` is raised after
+    all of the types it printed have been yielded. If parsing fails, or the
+    iterator is closed before the command finishes, the command is killed.
+    """
+    with subprocess.Popen(
+        command,
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=stderr,
+        encoding="utf-8",
+        errors="replace",
+    ) as process:
+        try:
+            yield from _iter_parse_fast(
+                process.stdout,  # type: ignore
+                type_filter=type_filter,
+                on_error=on_error,
+            )
+        except BaseException:
+            process.kill()
+            raise
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def parse_path(
+    path: Union[str, "os.PathLike[str]"], on_error: Optional[OnError] = None
+) -> List:
+    """
+    Parse a file containing the output of `rustc -Zprint-type-sizes`
+    into a list of `Type`s, using a memory-mapped file; see `iter_parse_path`.
+    """
+    return list(iter_parse_path(path, on_error=on_error))
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """
+    Split `text` at each `separator` which is not nested inside
+    brackets, e.g. the commas separating generic arguments.
+    """
+    parts = []
+    depth = 0
+    part_start = 0
+    for index, character in enumerate(text):
+        if character in "<([{":
+            depth += 1
+        elif character in ">)]}":
+            # The `>` in a function type's `->` is not a bracket.
+            if not (character == ">" and text[index - 1 : index] == "-"):
+                depth -= 1
+        elif character == separator and depth == 0:
+            parts.append(text[part_start:index])
+            part_start = index + 1
+    parts.append(text[part_start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+# References, pointers, trait objects, and higher-ranked trait bounds.
+_TYPE_PREFIX_RE = re.compile(
+    r"^(?:&(?:'\w+\s+)?|\*const\s+|\*mut\s+|mut\s+|dyn\s+|impl\s+|for<[^>]*>\s+)+"
+)
+
+
+def component_type_names(type_expression: str) -> List[str]:
+    """
+    Find the names of the types which make up a type expression,
+    e.g. the element types of a tuple, or the generic arguments of a path.
+    The names are returned as written, in order, and may themselves be
+    references or pointers, e.g. `&'a str`; see `referenced_type_names`.
+    """
+    type_expression = _TYPE_PREFIX_RE.sub("", type_expression.strip())
+    if not type_expression or type_expression[0] in "'_0123456789":
+        # Lifetimes, inferred types, and const generic arguments.
+        return []
+    elif type_expression[0] in "([":
+        # Tuples, arrays, and slices.
+        elements = _split_top_level(type_expression[1:-1], ",")
+        if type_expression[0] == "[":
+            elements = _split_top_level(type_expression[1:-1], ";")[:1]
+        return elements
+    elif len(_split_top_level(type_expression, "+")) > 1:
+        # Trait objects with multiple bounds.
+        return _split_top_level(type_expression, "+")
+    else:
+        generic_arguments_start = type_expression.find("<")
+        if generic_arguments_start <= 0 or not type_expression.endswith(">"):
+            return []
+        return _split_top_level(type_expression[generic_arguments_start + 1 : -1], ",")
+
+
+def referenced_type_names(type_name: str) -> List[str]:
+    """
+    Find the names of all types which appear in the generic arguments of
+    a type name, at any depth. For example, the types referenced by
+    `std::result::Result<alloc::vec::Vec<u8>, std::io::Error>` are
+    `alloc::vec::Vec<u8>`, `u8`, and `std::io::Error`.
+    """
+    referenced_names: Dict[str, None] = {}
+    pending_expressions = component_type_names(type_name)
+    while pending_expressions:
+        type_expression = pending_expressions.pop(0)
+        stripped_expression = _TYPE_PREFIX_RE.sub("", type_expression)
+        if (
+            stripped_expression
+            and stripped_expression[0] not in "'_0123456789(["
+            and len(_split_top_level(stripped_expression, "+")) == 1
+        ):
+            referenced_names.setdefault(stripped_expression)
+        pending_expressions.extend(component_type_names(type_expression))
+    return list(referenced_names)
+
+
+_REGEX_PATTERN_PREFIX = "re:"
+
+
+def _compile_name_patterns(patterns: Sequence[str]) -> Optional[Pattern]:
+    if not patterns:
+        return None
+    return re.compile(
+        "|".join(
+            f"(?:{pattern[len(_REGEX_PATTERN_PREFIX):]})"
+            if pattern.startswith(_REGEX_PATTERN_PREFIX)
+            else "^" + fnmatch.translate(pattern)
+            for pattern in patterns
+        )
+    )
+
+
+def type_name_filter(
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    roots: Sequence[str] = (),
+) -> TypeFilter:
+    """
+    Create a `TypeFilter` which selects types by name.
+
+    `include` and `exclude` are glob patterns matched against the whole
+    type name; patterns starting with `re:` are instead regular expressions,
+    which match anywhere in the type name.
+    A type is selected if it matches any `include` pattern, or if there are
+    none, and does not match any `exclude` pattern.
+
+    If `roots` are given, only the root types themselves, and the types
+    which are transitively referenced by their generic arguments
+    (see `referenced_type_names`), are selected.
+    """
+    include_pattern = _compile_name_patterns(include)
+    exclude_pattern = _compile_name_patterns(exclude)
+    reachable_names: Optional[Set[str]] = None
+    if roots:
+        reachable_names = set(roots)
+        for root in roots:
+            reachable_names.update(referenced_type_names(root))
+
+    def accept(type_name: str) -> bool:
+        if reachable_names is not None and type_name not in reachable_names:
+            return False
+        if include_pattern is not None and not include_pattern.search(type_name):
+            return False
+        if exclude_pattern is not None and exclude_pattern.search(type_name):
+            return False
+        return True
+
+    return accept
+
+
+def _intern_names(rust_type: Type):
+    rust_type.type_name = sys.intern(rust_type.type_name)
+    for rust_type_field in rust_type.fields:
+        if isinstance(rust_type_field, Field):
+            rust_type_field.field_name = sys.intern(rust_type_field.field_name)
+        elif isinstance(rust_type_field, Variant):
+            rust_type_field.variant_name = sys.intern(rust_type_field.variant_name)
+            for rust_variant_field in rust_type_field.fields or []:
+                if isinstance(rust_variant_field, Field):
+                    rust_variant_field.field_name = sys.intern(
+                        rust_variant_field.field_name
+                    )
+
+
+def deduplicate_types(
+    rust_types: Iterable[Type],
+    on_conflict: Optional[Callable[[Type, Type], None]] = None,
+) -> Iterator[Type]:
+    """
+    Collapse repeated definitions of the same type.
+
+    rustc prints a type once for every crate which instantiates it,
+    so the same `Type` can appear many times in a single dump.
+    Only the first definition of each type name is yielded.
+    A later definition with the same name but a different layout is
+    dropped as well, and is passed to `on_conflict`
+    along with the first definition.
+
+    Type, field and variant names are interned as they are seen,
+    so repeated names share a single string.
+    """
+    seen_types: Dict[str, Type] = {}
+    for rust_type in rust_types:
+        _intern_names(rust_type)
+        seen_type = seen_types.get(rust_type.type_name)
+        if seen_type is None:
+            seen_types[rust_type.type_name] = rust_type
+            yield rust_type
+        elif seen_type != rust_type and on_conflict is not None:
+            on_conflict(seen_type, rust_type)
+
+
+def layout_fingerprint(rust_type: Type) -> str:
+    """
+    Compute a digest of the complete layout of a type, including all of
+    its names and sizes; it changes whenever any part of the layout changes.
+    """
+    return hashlib.blake2b(repr(rust_type).encode(), digest_size=16).hexdigest()
+
+
+_CRATE_NAME_RE = re.compile(r"[&*]?(?:const |mut )?([A-Za-z_][A-Za-z0-9_]*)::")
+
+
+def _crate_name(type_name: str) -> str:
+    """
+    Return the first path segment of a type's name, which is usually the
+    name of the crate defining it, or an empty string for closures, tuples,
+    and other types without a path.
+    """
+    match = _CRATE_NAME_RE.match(type_name)
+    return "" if match is None else match.group(1)
+
+
+def _fields_size(rust_fields: Iterable[Union[Field, Padding]]) -> int:
+    return sum(
+        rust_field.field_size
+        for rust_field in rust_fields
+        if isinstance(rust_field, Field)
+    )
+
+
+class LayoutStats:
+    """
+    Layout statistics for many parsed types, for finding types which waste
+    space. Each type's statistics are computed once, as it is added, and
+    stored in parallel columns of machine integers, one entry per type;
+    the reports below then sort and sum whole columns at once.
+
+    - `padding_bytes` is the part of a type which is not covered by its
+      fields, or, for an enum, by its discriminant and the fields of its
+      largest variant.
+    - `alignment_waste` is the part of that padding at the end of a type,
+      which is only there to round its size up to its alignment.
+    - `variant_imbalance` is the difference between the sizes of the
+      largest and smallest variants of an enum, which is wasted whenever
+      the enum holds its smallest variant.
+    """
+
+    def __init__(self, rust_types: Iterable[Type] = ()):
+        self.type_names: List[str] = []
+        self.type_sizes = array("Q")
+        self.type_alignments = array("Q")
+        self.padding_bytes = array("Q")
+        self.alignment_waste = array("Q")
+        self.variant_imbalance = array("Q")
+        # The padding bytes and number of types in each crate,
+        # indexed by the position of the crate's name in `crate_names`.
+        self.crate_names: List[str] = []
+        self.crate_padding_bytes = array("Q")
+        self.crate_type_counts = array("Q")
+        self._crate_indices: Dict[str, int] = {}
+        for rust_type in rust_types:
+            self.add(rust_type)
+
+    def __len__(self) -> int:
+        return len(self.type_names)
+
+    def add(self, rust_type: Type):
+        discriminant_size = 0
+        variants: List[Variant] = []
+        trailing_padding_size = 0
+        for rust_type_field in rust_type.fields:
+            if isinstance(rust_type_field, Padding):
+                trailing_padding_size += rust_type_field.padding_size
+                continue
+            trailing_padding_size = 0
+            if isinstance(rust_type_field, Discriminant):
+                discriminant_size += rust_type_field.discriminant_size
+            elif isinstance(rust_type_field, Variant):
+                variants.append(rust_type_field)
+
+        if variants:
+            largest_variant_fields_size = max(
+                _fields_size(rust_variant.fields or []) for rust_variant in variants
+            )
+            variant_sizes = [rust_variant.variant_size for rust_variant in variants]
+            padding_bytes = (
+                rust_type.type_size - discriminant_size - largest_variant_fields_size
+            )
+            alignment_waste = (
+                rust_type.type_size - discriminant_size - max(variant_sizes)
+            )
+            variant_imbalance = max(variant_sizes) - min(variant_sizes)
+        else:
+            padding_bytes = rust_type.type_size - _fields_size(
+                rust_field
+                for rust_field in rust_type.fields
+                if isinstance(rust_field, Field)
+            )
+            alignment_waste = trailing_padding_size
+            variant_imbalance = 0
+
+        self.type_names.append(rust_type.type_name)
+        self.type_sizes.append(rust_type.type_size)
+        self.type_alignments.append(rust_type.type_alignment_bytes)
+        # Fields printed with offsets may overlap, as in a union, so that
+        # they cover more than the whole type.
+        self.padding_bytes.append(max(padding_bytes, 0))
+        self.alignment_waste.append(max(alignment_waste, 0))
+        self.variant_imbalance.append(variant_imbalance)
+
+        crate_name = _crate_name(rust_type.type_name)
+        crate_index = self._crate_indices.get(crate_name)
+        if crate_index is None:
+            crate_index = self._crate_indices[crate_name] = len(self.crate_names)
+            self.crate_names.append(crate_name)
+            self.crate_padding_bytes.append(0)
+            self.crate_type_counts.append(0)
+        self.crate_padding_bytes[crate_index] += self.padding_bytes[-1]
+        self.crate_type_counts[crate_index] += 1
+
+    def largest(self, column: "array[int]", count: int) -> List[Tuple[str, int]]:
+        """
+        Return the names and values of the `count` types with the largest
+        nonzero values in `column`, e.g. `self.padding_bytes`,
+        from largest to smallest.
+        """
+        indices = heapq.nlargest(count, range(len(column)), key=column.__getitem__)
+        return [
+            (self.type_names[index], column[index])
+            for index in indices
+            if column[index]
+        ]
+
+    def largest_crates(self, count: int) -> List[Tuple[str, int, int]]:
+        """
+        Return the names, padding bytes, and number of types of the `count`
+        crates with the most padding bytes, from most to least.
+        """
+        indices = heapq.nlargest(
+            count,
+            range(len(self.crate_names)),
+            key=self.crate_padding_bytes.__getitem__,
+        )
+        return [
+            (
+                self.crate_names[index],
+                self.crate_padding_bytes[index],
+                self.crate_type_counts[index],
+            )
+            for index in indices
+            if self.crate_padding_bytes[index]
+        ]
+
+    def write_report(self, output: TextIO, count: int = 20):
+        """Write the `count` worst types by each statistic to `output`."""
+        total_size = sum(self.type_sizes)
+        total_padding_bytes = sum(self.padding_bytes)
+        output.write(
+            f"{len(self)} types, {total_size} bytes, "
+            f"{total_padding_bytes} bytes of padding"
+            f" ({total_padding_bytes / max(total_size, 1):.1%})\n"
+        )
+        for title, column in (
+            ("Largest types", self.type_sizes),
+            ("Most padding bytes", self.padding_bytes),
+            ("Most alignment waste bytes", self.alignment_waste),
+            ("Largest variant size imbalance in bytes", self.variant_imbalance),
+        ):
+            output.write(f"\n{title}:\n")
+            for type_name, value in self.largest(column, count):
+                output.write(f"{value:>12}  {type_name}\n")
+
+        output.write("\nMost padding bytes by crate:\n")
+        for crate_name, padding_bytes, type_count in self.largest_crates(count):
+            output.write(
+                f"{padding_bytes:>12}  {crate_name or '(no crate)'} ({type_count} types)\n"
+            )
+
+
+def _field_layouts(
+    rust_fields: Iterable[Union[Field, Padding]], first_offset: int = 0
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Return the offset and size of each field, by name. Fields without a
+    recorded offset directly follow the preceding field or padding.
+    """
+    field_layouts: Dict[str, Tuple[int, int]] = {}
+    offset = first_offset
+    for rust_field in rust_fields:
+        if isinstance(rust_field, Padding):
+            offset += rust_field.padding_size
+            continue
+        if rust_field.field_offset_bytes is not None:
+            offset = rust_field.field_offset_bytes
+        field_layouts.setdefault(rust_field.field_name, (offset, rust_field.field_size))
+        offset += rust_field.field_size
+    return field_layouts
+
+
+def _describe_field_changes(
+    old_fields: Dict[str, Tuple[int, int]],
+    new_fields: Dict[str, Tuple[int, int]],
+    prefix: str = "",
+) -> List[str]:
+    changes: List[str] = []
+    for field_name, (old_offset, old_size) in old_fields.items():
+        new_field = new_fields.get(field_name)
+        if new_field is None:
+            changes.append(f"{prefix}field `{field_name}` removed")
+            continue
+        new_offset, new_size = new_field
+        if old_size != new_size:
+            changes.append(
+                f"{prefix}field `{field_name}` size {old_size} -> {new_size} bytes"
+            )
+        if old_offset != new_offset:
+            changes.append(
+                f"{prefix}field `{field_name}` offset {old_offset} -> {new_offset} bytes"
+            )
+    for field_name, (new_offset, new_size) in new_fields.items():
+        if field_name not in old_fields:
+            changes.append(
+                f"{prefix}field `{field_name}` added, {new_size} bytes at offset {new_offset}"
+            )
+    return changes
+
+
+def describe_layout_changes(old_type: Type, new_type: Type) -> List[str]:
+    """
+    Describe the differences between two layouts of the same type:
+    its size and alignment, and the sizes and offsets of its fields,
+    and of the fields of each of its variants.
+    """
+    changes: List[str] = []
+    if old_type.type_size != new_type.type_size:
+        changes.append(f"size {old_type.type_size} -> {new_type.type_size} bytes")
+    if old_type.type_alignment_bytes != new_type.type_alignment_bytes:
+        changes.append(
+            f"alignment {old_type.type_alignment_bytes} -> {new_type.type_alignment_bytes} bytes"
+        )
+
+    old_discriminant_size = sum(
+        field.discriminant_size
+        for field in old_type.fields
+        if isinstance(field, Discriminant)
+    )
+    new_discriminant_size = sum(
+        field.discriminant_size
+        for field in new_type.fields
+        if isinstance(field, Discriminant)
+    )
+    if old_discriminant_size != new_discriminant_size:
+        changes.append(
+            f"discriminant {old_discriminant_size} -> {new_discriminant_size} bytes"
+        )
+
+    changes.extend(
+        _describe_field_changes(
+            _field_layouts(
+                field
+                for field in old_type.fields
+                if isinstance(field, (Field, Padding))
+            ),
+            _field_layouts(
+                field
+                for field in new_type.fields
+                if isinstance(field, (Field, Padding))
+            ),
+        )
+    )
+
+    old_variants = {
+        field.variant_name: field
+        for field in old_type.fields
+        if isinstance(field, Variant)
+    }
+    new_variants = {
+        field.variant_name: field
+        for field in new_type.fields
+        if isinstance(field, Variant)
+    }
+    for variant_name, old_variant in old_variants.items():
+        new_variant = new_variants.get(variant_name)
+        if new_variant is None:
+            changes.append(f"variant `{variant_name}` removed")
+            continue
+        if old_variant.variant_size != new_variant.variant_size:
+            changes.append(
+                f"variant `{variant_name}` size {old_variant.variant_size} -> {new_variant.variant_size} bytes"
+            )
+        changes.extend(
+            _describe_field_changes(
+                _field_layouts(old_variant.fields or [], old_discriminant_size),
+                _field_layouts(new_variant.fields or [], new_discriminant_size),
+                prefix=f"variant `{variant_name}` ",
+            )
+        )
+    for variant_name, new_variant in new_variants.items():
+        if variant_name not in old_variants:
+            changes.append(
+                f"variant `{variant_name}` added, {new_variant.variant_size} bytes"
+            )
+
+    # Changes which are not covered above, e.g. reordered fields.
+    if not changes and old_type != new_type:
+        changes.append("layout changed")
+    return changes
+
+
+@dataclass
+class LayoutDiff:
+    """The differences between the types in two dumps, by type name."""
+
+    added: List[str]
+    removed: List[str]
+    changed: Dict[str, List[str]]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+def diff_layouts(old_types: Iterable[Type], new_types: Iterable[Type]) -> LayoutDiff:
+    """
+    Compare two sets of types, e.g. parsed from the dumps of two builds
+    with different toolchains, by name. Only the first definition of each
+    type name in each set is compared, as in `deduplicate_types`.
+
+    Only the old types are held in memory, indexed by name; the new types
+    are compared one at a time as they are iterated over, so the new types
+    can be streamed from the parser.
+    """
+    old_types_by_name = {
+        rust_type.type_name: rust_type for rust_type in deduplicate_types(old_types)
+    }
+    added: List[str] = []
+    changed: Dict[str, List[str]] = {}
+    new_type_names: Set[str] = set()
+    for new_type in new_types:
+        if new_type.type_name in new_type_names:
+            continue
+        new_type_names.add(new_type.type_name)
+        old_type = old_types_by_name.get(new_type.type_name)
+        if old_type is None:
+            added.append(new_type.type_name)
+        elif old_type != new_type:
+            changed[new_type.type_name] = describe_layout_changes(old_type, new_type)
+    removed = [
+        type_name for type_name in old_types_by_name if type_name not in new_type_names
+    ]
+    return LayoutDiff(added=added, removed=removed, changed=changed)
+
+
+# Parsed types can also be stored in JSON Lines format, with one `Type`
+# per line, which is much faster to load than the original text.
+# Objects use the same keys as the attributes of the record types above,
+# and every field-like object has a "kind" key naming its record type.
+_JSON_FIELD_KIND = "field"
+_JSON_PADDING_KIND = "padding"
+_JSON_DISCRIMINANT_KIND = "discriminant"
+_JSON_VARIANT_KIND = "variant"
+
+
+def _field_to_json(field: Union[Field, Padding, Discriminant, Variant]) -> Dict:
+    if isinstance(field, Field):
+        return {
+            "kind": _JSON_FIELD_KIND,
+            "field_name": field.field_name,
+            "field_size": field.field_size,
+            "field_offset_bytes": field.field_offset_bytes,
+            "field_alignment_bytes": field.field_alignment_bytes,
+        }
+    elif isinstance(field, Padding):
+        return {"kind": _JSON_PADDING_KIND, "padding_size": field.padding_size}
+    elif isinstance(field, Discriminant):
+        return {
+            "kind": _JSON_DISCRIMINANT_KIND,
+            "discriminant_size": field.discriminant_size,
+        }
+    else:
+        return {
+            "kind": _JSON_VARIANT_KIND,
+            "variant_name": field.variant_name,
+            "variant_size": field.variant_size,
+            "fields": None
+            if field.fields is None
+            else [_field_to_json(variant_field) for variant_field in field.fields],
+        }
+
+
+def _field_from_json(field_json: Dict) -> Union[Field, Padding, Discriminant, Variant]:
+    kind = field_json["kind"]
+    if kind == _JSON_FIELD_KIND:
+        return Field(
+            field_name=field_json["field_name"],
+            field_size=field_json["field_size"],
+            field_offset_bytes=field_json["field_offset_bytes"],
+            field_alignment_bytes=field_json["field_alignment_bytes"],
+        )
+    elif kind == _JSON_PADDING_KIND:
+        return Padding(field_json["padding_size"])
+    elif kind == _JSON_DISCRIMINANT_KIND:
+        return Discriminant(field_json["discriminant_size"])
+    elif kind == _JSON_VARIANT_KIND:
+        return Variant(
+            variant_name=field_json["variant_name"],
+            variant_size=field_json["variant_size"],
+            fields=None
+            if field_json["fields"] is None
+            else [
+                _field_from_json(variant_field)  # type: ignore
+                for variant_field in field_json["fields"]
+            ],
+        )
+    else:
+        raise ValueError(f"Unknown field kind {kind!r}")
+
+
+def type_to_json(rust_type: Type) -> Dict:
+    """Convert a `Type` to a JSON-serializable `dict`."""
+    return {
+        "type_name": rust_type.type_name,
+        "type_size": rust_type.type_size,
+        "type_alignment_bytes": rust_type.type_alignment_bytes,
+        "fields": [_field_to_json(field) for field in rust_type.fields],
+    }
+
+
+def type_from_json(type_json: Dict) -> Type:
+    """Convert a `dict` created by `type_to_json` back to a `Type`."""
+    return Type(
+        type_name=type_json["type_name"],
+        type_size=type_json["type_size"],
+        type_alignment_bytes=type_json["type_alignment_bytes"],
+        fields=[_field_from_json(field) for field in type_json["fields"]],
+    )
+
+
+def dump_jsonl(rust_types: Iterable[Type], output: TextIO):
+    """Write types to `output` in JSON Lines format, one type per line."""
+    for rust_type in rust_types:
+        output.write(json.dumps(type_to_json(rust_type)))
+        output.write("\n")
+
+
+def iter_load_jsonl(data: TextIO) -> Iterator[Type]:
+    """
+    Incrementally load types written by `dump_jsonl`.
+    Raises `ValueError` on malformed input.
+    """
+    for line_number, line in enumerate(data, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield type_from_json(json.loads(line))
+        except (KeyError, TypeError, ValueError) as err:
+            raise ValueError(f"Invalid type on line {line_number}: {err}") from err
 
 
 if __name__ == "__main__":
@@ -222,10 +1429,140 @@ if __name__ == "__main__":
     argparser = ArgumentParser()
     argparser.add_argument(
         "print_type_sizes_output_file",
-        help="A file containing Rust type layout information, which is the output of `rustc +nightly -Zprint-type-sizes`",
+        help="A file containing Rust type layout information, which is the output of `rustc +nightly -Zprint-type-sizes`, or `-` to parse standard input as it is written, e.g. when piped from a running build",
+    )
+    argparser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=ENGINE_PYPARSING,
+        help="The parser implementation to use",
+    )
+    argparser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of worker processes to parse with; types are printed once the whole file is parsed",
+    )
+    argparser.add_argument(
+        "--output-format",
+        choices=("pprint", "jsonl", "report"),
+        default="pprint",
+        help="The format to print types in; jsonl prints one JSON object per type, which can be loaded with iter_load_jsonl, and report prints the types which waste the most space instead, see LayoutStats",
+    )
+    argparser.add_argument(
+        "--diff-against",
+        metavar="OLD_FILE",
+        help="Compare the types with those in this older dump instead of printing them, listing the types which were added (+), removed (-), or changed (~); exits with status 1 if any were",
+    )
+    argparser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="The number of types to list for each statistic with --output-format report",
+    )
+    argparser.add_argument(
+        "--deduplicate",
+        action="store_true",
+        help="Only print the first definition of each type, and report conflicting definitions",
+    )
+    argparser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        help="Only print types whose names match this glob pattern, or regular expression if prefixed with `re:`; may be repeated",
+    )
+    argparser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Do not print types whose names match this glob pattern, or regular expression if prefixed with `re:`; may be repeated",
+    )
+    argparser.add_argument(
+        "--root",
+        action="append",
+        default=[],
+        help="Only print this type and the types in its generic arguments; may be repeated",
+    )
+    argparser.add_argument(
+        "--tolerant",
+        action="store_true",
+        help="Skip malformed type records, reporting them, rather than stopping at the first one",
     )
     args = argparser.parse_args()
 
-    with open(args.print_type_sizes_output_file, "r") as f:
-        result = parse(f)
-        pprint(result)
+    type_filter: Optional[TypeFilter] = None
+    if args.include or args.exclude or args.root:
+        type_filter = type_name_filter(
+            include=args.include, exclude=args.exclude, roots=args.root
+        )
+
+    def report_conflict(seen_type: Type, conflicting_type: Type):
+        print(
+            f"Conflicting layouts for type {seen_type.type_name}: {seen_type} and {conflicting_type}",
+            file=sys.stderr,
+        )
+
+    def report_malformed_record(error: MalformedRecord):
+        type_description = (
+            "" if error.type_name is None else f" in type {error.type_name}"
+        )
+        print(
+            f"Skipped malformed record{type_description} on line {error.line_number}: {error.line}",
+            file=sys.stderr,
+        )
+
+    on_error = report_malformed_record if args.tolerant else None
+
+    if args.print_type_sizes_output_file == "-":
+        input_file = sys.stdin
+    else:
+        input_file = open(args.print_type_sizes_output_file, "r")
+    with input_file as f:
+        if args.diff_against is not None:
+            with open(args.diff_against, "r") as old_file:
+                layout_diff = diff_layouts(
+                    iter_parse(
+                        old_file,
+                        engine=args.engine,
+                        type_filter=type_filter,
+                        on_error=on_error,
+                    ),
+                    iter_parse(
+                        f,
+                        engine=args.engine,
+                        type_filter=type_filter,
+                        on_error=on_error,
+                    ),
+                )
+            for type_name in layout_diff.added:
+                print(f"+ {type_name}")
+            for type_name in layout_diff.removed:
+                print(f"- {type_name}")
+            for type_name, changes in layout_diff.changed.items():
+                print(f"~ {type_name}: {'; '.join(changes)}")
+            sys.exit(1 if layout_diff else 0)
+
+        rust_types: Iterable[Type]
+        if args.workers > 1:
+            rust_types = parse(
+                f, engine=args.engine, workers=args.workers, on_error=on_error
+            )
+            if type_filter is not None:
+                rust_types = [
+                    rust_type
+                    for rust_type in rust_types
+                    if type_filter(rust_type.type_name)
+                ]
+        else:
+            rust_types = iter_parse(
+                f, engine=args.engine, type_filter=type_filter, on_error=on_error
+            )
+        if args.deduplicate:
+            rust_types = deduplicate_types(rust_types, on_conflict=report_conflict)
+        if args.output_format == "jsonl":
+            dump_jsonl(rust_types, sys.stdout)
+        elif args.output_format == "report":
+            LayoutStats(rust_types).write_report(sys.stdout, count=args.top)
+        else:
+            for rust_type in rust_types:
+                pprint(rust_type)
@@ -0,0 +1,170 @@
+"""
+Deterministic generation of synthetic `-Zprint-type-sizes` output,
+for benchmarking the parser and importer on inputs of arbitrary size.
+"""
+
+import random
+from typing import Iterator, List, TextIO, Tuple
+
+_PATH_SEGMENTS = [
+    "core",
+    "alloc",
+    "std",
+    "iter",
+    "adapters",
+    "collections",
+    "hash_map",
+    "sync",
+    "mpsc",
+    "fmt",
+    "io",
+    "net",
+    "workspace_crate",
+    "parser",
+    "ast",
+]
+_TYPE_NAMES = [
+    "Vec",
+    "Option",
+    "Result",
+    "Box",
+    "Arc",
+    "RawTable",
+    "Map",
+    "Filter",
+    "Chain",
+    "Expr",
+    "Statement",
+    "Error",
+]
+_PRIMITIVE_NAMES = ["u8", "u16", "u32", "u64", "usize", "i64", "bool", "char"]
+_FIELD_NAMES = [".0", ".1", ".2", ".len", ".ptr", ".cap", ".inner", ".state"]
+_FIELD_SIZES = [0, 1, 2, 4, 8, 8, 8, 16, 24, 32, 48]
+
+
+def _type_path(rng: random.Random) -> str:
+    return "::".join(rng.choice(_PATH_SEGMENTS) for _ in range(rng.randint(1, 4)))
+
+
+def _generic_type_name(rng: random.Random, depth: int) -> str:
+    name = f"{_type_path(rng)}::{rng.choice(_TYPE_NAMES)}"
+    if depth == 0:
+        return f"{name}<{rng.choice(_PRIMITIVE_NAMES)}>"
+    arguments = [_generic_type_name(rng, depth - 1) for _ in range(rng.randint(1, 2))]
+    return f"{name}<{', '.join(arguments)}>"
+
+
+def _type_name(rng: random.Random, index: int) -> str:
+    kind = rng.random()
+    if kind < 0.15:
+        return f"{{closure@src/module_{index % 97}.rs:{index % 1000}:{index % 80}}}"
+    elif kind < 0.35:
+        # Long, deeply nested generic names.
+        return _generic_type_name(rng, depth=rng.randint(3, 5))
+    else:
+        return _generic_type_name(rng, depth=rng.randint(0, 2))
+
+
+def _field_lines(
+    rng: random.Random, indent: str, with_offsets: bool, first_offset: int = 0
+) -> Tuple[List[str], int]:
+    """
+    Return the lines of the fields of a struct or variant, and their size.
+    As printed by rustc, offsets are from the start of the whole type,
+    so the fields of an enum variant start after the discriminant,
+    at `first_offset`.
+    """
+    lines = []
+    size = 0
+    for field_index in range(rng.randint(1, 6)):
+        field_name = (
+            _FIELD_NAMES[field_index]
+            if field_index < len(_FIELD_NAMES)
+            else f".field{field_index}"
+        )
+        field_size = rng.choice(_FIELD_SIZES)
+        # Padding-heavy layouts.
+        if field_index > 0 and rng.random() < 0.3:
+            padding_size = rng.choice([1, 3, 4, 7])
+            lines.append(f"print-type-size {indent}padding: {padding_size} bytes")
+            size += padding_size
+        if with_offsets and rng.random() < 0.5:
+            field_offset = first_offset + size
+            # The largest alignment which the offset satisfies,
+            # so that every printed offset is aligned.
+            field_alignment = min(max(field_size, 1), 8)
+            while field_offset % field_alignment:
+                field_alignment //= 2
+            lines.append(
+                f"print-type-size {indent}field `{field_name}`: {field_size} bytes, offset: {field_offset} bytes, alignment: {field_alignment} bytes"
+            )
+        else:
+            lines.append(
+                f"print-type-size {indent}field `{field_name}`: {field_size} bytes"
+            )
+        size += field_size
+    return lines, size
+
+
+def _type_lines(rng: random.Random, index: int) -> List[str]:
+    type_name = _type_name(rng, index)
+    alignment = rng.choice([1, 2, 4, 8])
+
+    if rng.random() < 0.6:
+        # A struct.
+        lines, size = _field_lines(rng, "    ", with_offsets=False)
+        if size % alignment:
+            end_padding = alignment - size % alignment
+            lines.append(f"print-type-size     end padding: {end_padding} bytes")
+            size += end_padding
+    else:
+        # An enum, with or without a discriminant.
+        lines = []
+        discriminant_size = rng.choice([0, 1, 4, 8])
+        if discriminant_size:
+            lines.append(f"print-type-size     discriminant: {discriminant_size} bytes")
+        largest_variant_size = 0
+        for variant_index in range(rng.randint(1, 12)):
+            if rng.random() < 0.2:
+                lines.append(
+                    f"print-type-size     variant `Unit{variant_index}`: 0 bytes"
+                )
+                continue
+            variant_lines, variant_size = _field_lines(
+                rng, "        ", with_offsets=True, first_offset=discriminant_size
+            )
+            lines.append(
+                f"print-type-size     variant `Variant{variant_index}`: {variant_size} bytes"
+            )
+            lines.extend(variant_lines)
+            largest_variant_size = max(largest_variant_size, variant_size)
+        size = discriminant_size + largest_variant_size
+        # The size of an enum is also a multiple of its alignment.
+        size += -size % alignment
+
+    return [
+        f"print-type-size type: `{type_name}`: {size} bytes, alignment: {alignment} bytes"
+    ] + lines
+
+
+def iter_synthetic_dump_lines(type_count: int, seed: int = 0) -> Iterator[str]:
+    """
+    Yield the lines, without line endings, of a synthetic dump of `type_count`
+    types. The same `type_count` and `seed` always produce the same output.
+    """
+    rng = random.Random(seed)
+    for index in range(type_count):
+        yield from _type_lines(rng, index)
+
+
+def write_synthetic_dump(output: TextIO, type_count: int, seed: int = 0) -> int:
+    """
+    Write a synthetic dump of `type_count` types to `output`,
+    returning the number of lines written.
+    """
+    line_count = 0
+    for line in iter_synthetic_dump_lines(type_count, seed):
+        output.write(line)
+        output.write("\n")
+        line_count += 1
+    return line_count
@@ -0,0 +1,136 @@
+import io
+import time
+import tracemalloc
+
+import pytest
+
+from ..parse import ENGINE_FAST, ENGINE_PYPARSING, parse, parse_path
+from .synthetic_dumps import write_synthetic_dump
+
+# The number of types in each benchmarked synthetic dump.
+# The pyparsing engine is only benchmarked on the smallest dump,
+# as it takes far too long on the larger ones.
+BENCHMARK_TYPE_COUNTS = [10000, 100000, 1000000]
+
+
+@pytest.fixture(scope="module")
+def synthetic_dumps(tmp_path_factory):
+    """Lazily write each synthetic dump once, returning its path and line count."""
+    dumps = {}
+
+    def get_synthetic_dump(type_count):
+        if type_count not in dumps:
+            dump_path = tmp_path_factory.mktemp("dumps") / f"{type_count}-types.txt"
+            with open(dump_path, "w") as dump_file:
+                line_count = write_synthetic_dump(dump_file, type_count)
+            dumps[type_count] = (dump_path, line_count)
+        return dumps[type_count]
+
+    return get_synthetic_dump
+
+
+def _report(name, type_count, line_count, run):
+    start = time.perf_counter()
+    result = run()
+    seconds = time.perf_counter() - start
+    del result
+
+    # Peak memory is measured in a separate run,
+    # since tracing allocations slows down the run considerably.
+    tracemalloc.start()
+    try:
+        result = run()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    print(
+        f"\n{name}, {type_count} types: {seconds:.2f}s, "
+        f"{line_count / seconds:,.0f} lines/s, "
+        f"peak memory {peak_bytes / (1024 * 1024):,.1f} MiB"
+    )
+    return result
+
+
+def test_synthetic_dump_parses():
+    dump = io.StringIO()
+    line_count = write_synthetic_dump(dump, 1000)
+    dump.seek(0)
+    fast_result = parse(dump, engine=ENGINE_FAST)
+    dump.seek(0)
+    pyparsing_result = parse(dump, engine=ENGINE_PYPARSING)
+
+    assert len(fast_result) == 1000
+    assert fast_result == pyparsing_result
+    assert line_count == len(dump.getvalue().splitlines())
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("type_count", BENCHMARK_TYPE_COUNTS)
+@pytest.mark.parametrize("engine", [ENGINE_FAST, ENGINE_PYPARSING])
+def test_benchmark_parse(synthetic_dumps, engine, type_count):
+    if engine == ENGINE_PYPARSING and type_count > BENCHMARK_TYPE_COUNTS[0]:
+        pytest.skip("The pyparsing engine is too slow for large dumps")
+    dump_path, line_count = synthetic_dumps(type_count)
+
+    def run():
+        with open(dump_path) as dump_file:
+            return parse(dump_file, engine=engine)
+
+    result = _report(f"parse, {engine} engine", type_count, line_count, run)
+    assert len(result) == type_count
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("type_count", BENCHMARK_TYPE_COUNTS)
+def test_benchmark_parse_path(synthetic_dumps, type_count):
+    dump_path, line_count = synthetic_dumps(type_count)
+    result = _report(
+        "parse_path", type_count, line_count, lambda: parse_path(dump_path)
+    )
+    assert len(result) == type_count
+
+
+class _MockBinaryView:
+    """
+    A stand-in for a BinaryView, which records the types defined on it,
+    so that the type building logic can be benchmarked in isolation.
+    """
+
+    def __init__(self):
+        self.metadata = {}
+        self.defined_type_count = 0
+
+    def query_metadata(self, key):
+        return self.metadata[key]
+
+    def store_metadata(self, key, value):
+        self.metadata[key] = value
+
+    def get_type_by_name(self, name):
+        return None
+
+    def define_user_types(self, type_list, progress_func):
+        self.defined_type_count += len(type_list)
+
+    def undefine_user_type(self, name):
+        pass
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("type_count", BENCHMARK_TYPE_COUNTS)
+def test_benchmark_create_binary_view_types(synthetic_dumps, type_count):
+    # Building types still needs the Binary Ninja type API.
+    pytest.importorskip("binaryninja")
+    from ..binja_plugin.type_import import create_binary_view_types
+
+    dump_path, line_count = synthetic_dumps(type_count)
+    rust_types = parse_path(dump_path)
+
+    def run():
+        bv = _MockBinaryView()
+        create_binary_view_types(bv=bv, rust_types=rust_types)  # type: ignore
+        return bv
+
+    bv = _report("create_binary_view_types", type_count, line_count, run)
+    assert bv.defined_type_count >= type_count
@@ -0,0 +1,130 @@
+import itertools
+import os
+import shutil
+from pathlib import Path
+from typing import List
+
+from ..cache import (
+    cache_key,
+    cached_parse_path,
+    load_cached_types,
+    store_cached_types,
+)
+from ..parse import MalformedRecord, parse_path
+
+test_data_directory = Path("tests") / Path("data")
+
+
+def test_cached_parse_path(tmp_path):
+    cache_directory = tmp_path / "cache"
+    data_filepath = test_data_directory / "print-type-sizes.txt"
+    expected = parse_path(data_filepath)
+
+    assert load_cached_types(cache_directory, cache_key(data_filepath)) is None
+    assert cached_parse_path(data_filepath, cache_directory) == expected
+    assert load_cached_types(cache_directory, cache_key(data_filepath)) == expected
+    assert cached_parse_path(data_filepath, cache_directory) == expected
+
+
+def test_cached_parse_path_type_filter(tmp_path):
+    cache_directory = tmp_path / "cache"
+    data_filepath = test_data_directory / "print-type-sizes.txt"
+    expected = parse_path(data_filepath)
+
+    def type_filter(type_name):
+        return type_name.startswith("core::")
+
+    expected_filtered = [
+        rust_type for rust_type in expected if type_filter(rust_type.type_name)
+    ]
+
+    # Filtered parses are not cached.
+    assert (
+        cached_parse_path(data_filepath, cache_directory, type_filter=type_filter)
+        == expected_filtered
+    )
+    assert load_cached_types(cache_directory, cache_key(data_filepath)) is None
+
+    # Once all of the types are cached, they are filtered when loaded.
+    cached_parse_path(data_filepath, cache_directory)
+    assert (
+        cached_parse_path(data_filepath, cache_directory, type_filter=type_filter)
+        == expected_filtered
+    )
+
+
+def test_cached_parse_path_incomplete(tmp_path):
+    cache_directory = tmp_path / "cache"
+    data_filepath = tmp_path / "types.txt"
+    data_filepath.write_text(
+        (test_data_directory / "structs.txt").read_text() + "print-type-size ty\n"
+    )
+
+    # A parse which skipped malformed records is not cached.
+    errors: List[MalformedRecord] = []
+    cached_parse_path(data_filepath, cache_directory, on_error=errors.append)
+    assert len(errors) == 1
+    assert load_cached_types(cache_directory, cache_key(data_filepath)) is None
+
+    # Nor is a parse which was stopped early.
+    rust_types = cached_parse_path(
+        test_data_directory / "structs.txt",
+        cache_directory,
+        track_parsed_types=lambda rust_types: itertools.islice(rust_types, 1),
+    )
+    assert len(rust_types) == 1
+    assert not cache_directory.exists() or not list(cache_directory.iterdir())
+
+
+def test_cached_parse_path_unwritable_cache(tmp_path):
+    # The cache directory cannot be created under a regular file.
+    cache_parent_path = tmp_path / "not-a-directory"
+    cache_parent_path.write_text("")
+    cache_directory = cache_parent_path / "cache"
+    data_filepath = test_data_directory / "print-type-sizes.txt"
+
+    assert cached_parse_path(data_filepath, cache_directory) == parse_path(
+        data_filepath
+    )
+    assert load_cached_types(cache_directory, cache_key(data_filepath)) is None
+
+
+def test_cache_key_changes_with_contents(tmp_path):
+    data_filepath = tmp_path / "types.txt"
+    shutil.copy(test_data_directory / "structs.txt", data_filepath)
+    structs_key = cache_key(data_filepath)
+    shutil.copy(test_data_directory / "variants.txt", data_filepath)
+    assert cache_key(data_filepath) != structs_key
+
+
+def test_corrupt_cache_file(tmp_path):
+    cache_directory = tmp_path / "cache"
+    data_filepath = test_data_directory / "variants.txt"
+    cached_parse_path(data_filepath, cache_directory)
+
+    (cache_file_path,) = cache_directory.iterdir()
+    cache_file_path.write_bytes(b"\x00")
+    assert load_cached_types(cache_directory, cache_key(data_filepath)) is None
+    assert cached_parse_path(data_filepath, cache_directory) == parse_path(
+        data_filepath
+    )
+
+
+def test_cache_eviction(tmp_path):
+    cache_directory = tmp_path / "cache"
+    rust_types = parse_path(test_data_directory / "variants.txt")
+
+    store_cached_types(cache_directory, "first", rust_types)
+    store_cached_types(cache_directory, "second", rust_types)
+    cache_entry_size = (cache_directory / "first.types").stat().st_size
+
+    # Make "first" the most recently used entry.
+    os.utime(cache_directory / "second.types", (0, 0))
+    assert load_cached_types(cache_directory, "first") == rust_types
+
+    store_cached_types(
+        cache_directory, "third", rust_types, max_cache_size_bytes=2 * cache_entry_size
+    )
+    assert load_cached_types(cache_directory, "second") is None
+    assert load_cached_types(cache_directory, "first") == rust_types
+    assert load_cached_types(cache_directory, "third") == rust_types
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pytest
+
+from ..parse import parse_path
+
+# These tests need a headless-capable Binary Ninja installation.
+binaryninja = pytest.importorskip("binaryninja")
+
+from ..binja_plugin.headless import import_into_databases  # noqa: E402
+
+
+def test_import_into_databases(tmp_path):
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    rust_types = parse_path(data_filepath)
+
+    # Creating the database initializes the Binary Ninja core in this
+    # process before the workers are started.
+    bv = binaryninja.BinaryView.new(b"\x00")
+    database_path = tmp_path / "database.bndb"
+    assert bv.create_database(str(database_path))
+    bv.file.close()
+    missing_database_path = tmp_path / "missing.bndb"
+
+    results = import_into_databases(
+        rust_types, [database_path, missing_database_path], workers=2
+    )
+    assert results[database_path] is None
+    assert results[missing_database_path] is not None
+
+    bv = binaryninja.load(str(database_path), update_analysis=False)
+    try:
+        for rust_type in rust_types[:10]:
+            assert bv.get_type_by_name(rust_type.type_name) is not None
+    finally:
+        bv.file.close()
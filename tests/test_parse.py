@@ -1,10 +1,38 @@
+import dataclasses
 import io
+import subprocess
+import sys
+import time
 from pathlib import Path
+from typing import List
 
 import pytest
 from pyparsing import ParseException
 
-from ..parse import Discriminant, Field, Padding, Type, Variant, parse
+from ..parse import (
+    ENGINES,
+    Discriminant,
+    Field,
+    LayoutStats,
+    MalformedRecord,
+    Padding,
+    Type,
+    Variant,
+    _parse_parallel,
+    _type,
+    deduplicate_types,
+    diff_layouts,
+    dump_jsonl,
+    iter_load_jsonl,
+    iter_parse,
+    iter_parse_command,
+    iter_parse_path,
+    layout_fingerprint,
+    parse,
+    parse_path,
+    referenced_type_names,
+    type_name_filter,
+)
 
 test_type_parse_data = [
     (
@@ -612,18 +640,571 @@ test_type_parse_data = [
 ]
 
 
+@pytest.mark.parametrize("engine", ENGINES)
 @pytest.mark.parametrize("data_filename, data_parsed_expected", test_type_parse_data)
-def test_type_parse(data_filename, data_parsed_expected):
+def test_type_parse(data_filename, data_parsed_expected, engine):
     data_filepath = Path("tests") / Path("data") / data_filename
     with open(data_filepath, "r") as type_sizes_file:
-        result = parse(type_sizes_file)
+        result = parse(type_sizes_file, engine=engine)
         assert result == data_parsed_expected
 
 
-def test_parse_failure():
+def test_engines_equivalent():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    with open(data_filepath, "r") as type_sizes_file:
+        pyparsing_result = parse(type_sizes_file, engine="pyparsing")
+    with open(data_filepath, "r") as type_sizes_file:
+        fast_result = parse(type_sizes_file, engine="fast")
+    assert len(fast_result) == 985
+    assert fast_result == pyparsing_result
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("data_filename, data_parsed_expected", test_type_parse_data)
+def test_type_iter_parse(data_filename, data_parsed_expected, engine):
+    data_filepath = Path("tests") / Path("data") / data_filename
+    with open(data_filepath, "r") as type_sizes_file:
+        result = iter_parse(type_sizes_file, engine=engine)
+        assert not isinstance(result, list)
+        assert list(result) == data_parsed_expected
+
+
+def test_pyparsing_grammar_built_once():
+    assert _type() is _type()
+    with io.StringIO("") as type_sizes_file:
+        parse(type_sizes_file, engine="pyparsing")
+    assert _type() is _type()
+
+
+@pytest.mark.parametrize("data_filename, data_parsed_expected", test_type_parse_data)
+def test_type_parse_path(data_filename, data_parsed_expected):
+    data_filepath = Path("tests") / Path("data") / data_filename
+    assert parse_path(data_filepath) == data_parsed_expected
+
+
+def test_parse_path_equivalent():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    with open(data_filepath, "r") as type_sizes_file:
+        assert parse_path(data_filepath) == parse(type_sizes_file, engine="fast")
+
+
+def test_parse_path_failure(tmp_path):
+    data_filepath = tmp_path / "failure.txt"
+    data_filepath.write_text(
+        """print-type-size type: `std::marker::PhantomData<*mut ()>`: 0 bytes, alignment: 1 bytes
+print-type-size ty"""
+    )
+    with pytest.raises(ParseException) as err:
+        parse_path(data_filepath)
+    assert "Unrecognized print-type-size record on line 2" in err.value.explain()
+    assert err.value.lineno == 2
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_iter_parse_yields_before_failure(engine):
+    test_iter_parse_data = """print-type-size type: `std::marker::PhantomData<*mut ()>`: 0 bytes, alignment: 1 bytes
+print-type-size type: `std::char::EscapeDefault`: 16 bytes, alignment: 8 bytes
+print-type-size     field `.state`: 16 bytes
+print-type-size type: `std::char::EscapeUnicode`: 16 bytes, alignment: 8 bytes
+print-type-size ty"""
+    with io.StringIO(test_iter_parse_data) as type_sizes_file:
+        result = iter_parse(type_sizes_file, engine=engine)
+        assert next(result).type_name == "std::marker::PhantomData<*mut ()>"
+        assert next(result).type_name == "std::char::EscapeDefault"
+        with pytest.raises(ParseException) as err:
+            next(result)
+        assert err.value.lineno == 5
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_parse_parallel(engine):
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    with open(data_filepath, "r") as type_sizes_file:
+        serial_result = parse(type_sizes_file, engine=engine)
+    with open(data_filepath, "r") as type_sizes_file:
+        parallel_result = parse(type_sizes_file, engine=engine, workers=2)
+    with open(data_filepath, "r") as type_sizes_file:
+        # Use small chunks, so that the file is split between several workers.
+        chunked_result = _parse_parallel(
+            type_sizes_file, engine=engine, workers=2, chunk_lines=500
+        )
+    assert parallel_result == serial_result
+    assert chunked_result == serial_result
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_parse_parallel_failure_line_number(engine):
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    with open(data_filepath, "r") as type_sizes_file:
+        test_parse_failure_data = type_sizes_file.read() + "print-type-size ty\n"
+    with io.StringIO(test_parse_failure_data) as type_sizes_file:
+        with pytest.raises(ParseException) as err:
+            _parse_parallel(type_sizes_file, engine=engine, workers=2, chunk_lines=500)
+        assert err.value.lineno == 4145
+        assert "(line:4145, col:1)" in err.value.explain()
+
+
+@pytest.mark.parametrize("data_filename, data_parsed_expected", test_type_parse_data)
+def test_jsonl_round_trip(data_filename, data_parsed_expected):
+    with io.StringIO() as jsonl_file:
+        dump_jsonl(data_parsed_expected, jsonl_file)
+        jsonl_file.seek(0)
+        assert jsonl_file.getvalue().count("\n") == len(data_parsed_expected)
+        assert list(iter_load_jsonl(jsonl_file)) == data_parsed_expected
+
+
+def test_jsonl_round_trip_equivalent():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    parsed = parse_path(data_filepath)
+    with io.StringIO() as jsonl_file:
+        dump_jsonl(parsed, jsonl_file)
+        jsonl_file.seek(0)
+        assert list(iter_load_jsonl(jsonl_file)) == parsed
+
+
+def test_jsonl_load_failure():
+    test_jsonl_failure_data = """{"type_name": "Number", "type_size": 24, "type_alignment_bytes": 8, "fields": [{"kind": "discriminant", "discriminant_size": 8}]}
+{"type_name": "Float", "type_size": 8, "type_alignment_bytes": 8, "fields": [{"kind": "float"}]}
+"""
+    with io.StringIO(test_jsonl_failure_data) as jsonl_file:
+        result = iter_load_jsonl(jsonl_file)
+        assert next(result).type_name == "Number"
+        with pytest.raises(ValueError) as err:
+            next(result)
+        assert "Invalid type on line 2" in str(err.value)
+
+
+def test_layout_fingerprint():
+    data_filepath = Path("tests") / Path("data") / "variants.txt"
+    first_parse = parse_path(data_filepath)
+    second_parse = parse_path(data_filepath)
+    assert [layout_fingerprint(rust_type) for rust_type in first_parse] == [
+        layout_fingerprint(rust_type) for rust_type in second_parse
+    ]
+    assert len({layout_fingerprint(rust_type) for rust_type in first_parse}) == len(
+        first_parse
+    )
+
+    changed_type = second_parse[1]
+    changed_variant = changed_type.fields[1]
+    assert isinstance(changed_variant, Variant)
+    changed_variant.variant_size += 8
+    assert layout_fingerprint(changed_type) != layout_fingerprint(first_parse[1])
+
+
+def test_record_memory_usage():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    with open(data_filepath, "r") as type_sizes_file:
+        result = parse(type_sizes_file, engine="fast")
+
+    fields = [
+        field
+        for rust_type in result
+        for field in rust_type.fields
+        if isinstance(field, Field)
+    ]
+    assert not hasattr(fields[0], "__dict__")
+
+    # A copy of `Field` without `__slots__`, to compare against.
+    UnslottedField = dataclasses.make_dataclass(
+        "UnslottedField", [field.name for field in dataclasses.fields(Field)]
+    )
+
+    unslotted_fields = [UnslottedField(*dataclasses.astuple(field)) for field in fields]
+
+    slotted_bytes = sum(sys.getsizeof(field) for field in fields)
+    unslotted_bytes = sum(
+        sys.getsizeof(field) + sys.getsizeof(field.__dict__)
+        for field in unslotted_fields
+    )
+    print(
+        f"{len(fields)} fields: {slotted_bytes / len(fields):.1f} bytes per slotted record, "
+        f"{unslotted_bytes / len(fields):.1f} bytes per unslotted record"
+    )
+    assert slotted_bytes < unslotted_bytes
+
+
+def test_deduplicate_types():
+    test_deduplicate_data = """print-type-size type: `core::fmt::Arguments<'_>`: 48 bytes, alignment: 8 bytes
+print-type-size     field `.pieces`: 16 bytes
+print-type-size     field `.fmt`: 16 bytes
+print-type-size     field `.args`: 16 bytes
+print-type-size type: `std::option::Option<usize>`: 16 bytes, alignment: 8 bytes
+print-type-size     discriminant: 8 bytes
+print-type-size     variant `Some`: 8 bytes
+print-type-size         field `.0`: 8 bytes
+print-type-size     variant `None`: 0 bytes
+print-type-size type: `core::fmt::Arguments<'_>`: 48 bytes, alignment: 8 bytes
+print-type-size     field `.pieces`: 16 bytes
+print-type-size     field `.fmt`: 16 bytes
+print-type-size     field `.args`: 16 bytes
+print-type-size type: `std::option::Option<usize>`: 16 bytes, alignment: 8 bytes
+print-type-size     discriminant: 8 bytes
+print-type-size     variant `Some`: 8 bytes
+print-type-size         field `.0`: 8 bytes
+print-type-size     variant `None`: 8 bytes
+"""
+    conflicts = []
+    with io.StringIO(test_deduplicate_data) as type_sizes_file:
+        result = list(
+            deduplicate_types(
+                iter_parse(type_sizes_file, engine="fast"),
+                on_conflict=lambda seen, conflicting: conflicts.append(
+                    (seen, conflicting)
+                ),
+            )
+        )
+
+    assert [rust_type.type_name for rust_type in result] == [
+        "core::fmt::Arguments<'_>",
+        "std::option::Option<usize>",
+    ]
+    some_variant = result[1].fields[1]
+    assert isinstance(some_variant, Variant)
+    assert some_variant.variant_name == "Some"
+
+    assert len(conflicts) == 1
+    seen_type, conflicting_type = conflicts[0]
+    assert seen_type is result[1]
+    assert conflicting_type.fields[2] == Variant(
+        variant_name="None", variant_size=8, fields=[]
+    )
+
+    # Equal names are interned to the same string object.
+    conflicting_some_variant = conflicting_type.fields[1]
+    assert isinstance(conflicting_some_variant, Variant)
+    assert some_variant.variant_name is conflicting_some_variant.variant_name
+
+
+def test_referenced_type_names():
+    assert referenced_type_names(
+        "std::result::Result<alloc::vec::Vec<u8>, std::io::Error>"
+    ) == ["alloc::vec::Vec<u8>", "std::io::Error", "u8"]
+    assert referenced_type_names(
+        "std::boxed::Box<dyn for<'a, 'b> std::ops::Fn(&'a std::panic::PanicInfo<'b>) + std::marker::Send + std::marker::Sync>"
+    ) == [
+        "std::ops::Fn(&'a std::panic::PanicInfo<'b>)",
+        "std::marker::Send",
+        "std::marker::Sync",
+    ]
+    assert referenced_type_names("core::fmt::Arguments<'_>") == []
+    assert referenced_type_names("std::marker::PhantomData<*mut ()>") == []
+
+
+def test_type_name_filter():
+    accept_all = type_name_filter()
+    assert accept_all("std::io::Error")
+
+    glob_filter = type_name_filter(include=["std::*"], exclude=["*::Error"])
+    assert glob_filter("std::option::Option<usize>")
+    assert not glob_filter("std::io::Error")
+    assert not glob_filter("core::fmt::Arguments<'_>")
+
+    regex_filter = type_name_filter(exclude=["re:\\{closure@"])
+    assert regex_filter("std::option::Option<usize>")
+    assert not regex_filter("std::option::Option<{closure@src/main.rs:3:13}>")
+
+    roots_filter = type_name_filter(
+        roots=["std::result::Result<alloc::vec::Vec<u8>, std::io::Error>"]
+    )
+    assert roots_filter("std::result::Result<alloc::vec::Vec<u8>, std::io::Error>")
+    assert roots_filter("alloc::vec::Vec<u8>")
+    assert roots_filter("std::io::Error")
+    assert not roots_filter("alloc::vec::Vec<u16>")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_iter_parse_type_filter(engine):
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    type_filter = type_name_filter(include=["std::option::Option<*"])
+    with open(data_filepath, "r") as type_sizes_file:
+        expected = [
+            rust_type
+            for rust_type in parse(type_sizes_file, engine=engine)
+            if type_filter(rust_type.type_name)
+        ]
+    assert expected
+
+    with open(data_filepath, "r") as type_sizes_file:
+        result = list(
+            iter_parse(type_sizes_file, engine=engine, type_filter=type_filter)
+        )
+    assert result == expected
+
+
+def test_iter_parse_path_type_filter():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    type_filter = type_name_filter(exclude=["std::*"])
+    result = list(iter_parse_path(data_filepath, type_filter=type_filter))
+    assert result == [
+        rust_type
+        for rust_type in parse_path(data_filepath)
+        if type_filter(rust_type.type_name)
+    ]
+
+
+@pytest.mark.parametrize(
+    "engine, expected_error",
+    [
+        ("pyparsing", "Expected end of text"),
+        ("fast", "Unrecognized print-type-size record on line 2"),
+    ],
+)
+def test_parse_failure(engine, expected_error):
     test_parse_failure_data = """print-type-size type: `std::marker::PhantomData<*mut ()>`: 0 bytes, alignment: 1 bytes
 print-type-size ty"""
     with io.StringIO(test_parse_failure_data) as type_sizes_file:
         with pytest.raises(ParseException) as err:
-            parse(type_sizes_file)
-        assert "Expected end of text" in err.value.explain()
+            parse(type_sizes_file, engine=engine)
+        assert expected_error in err.value.explain()
+
+
+test_tolerant_parse_data = """warning: unused variable: `x`
+print-type-size type: `std::char::EscapeDefault`: 16 bytes, alignment: 8 bytes
+print-type-size     field `.state`: 16 bytes
+print-type-size type: `std::char::EscapeUnicode`: 16 bytes, alignment: 8 bytes
+print-type-size     field `.c`: 4 bytes
+print-type-size     fie   Compiling foo v0.1.0
+print-type-size     field `.state`: 12 bytes
+print-type-size type: `std::marker::PhantomData<*mut ()>`: 0 bytes, alignment: 1 bytes
+print-type-size ty
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("workers", [1, 2])
+def test_tolerant_parse(engine, workers):
+    errors: List[MalformedRecord] = []
+    with io.StringIO(test_tolerant_parse_data) as type_sizes_file:
+        result = parse(
+            type_sizes_file, engine=engine, workers=workers, on_error=errors.append
+        )
+
+    assert [rust_type.type_name for rust_type in result] == ["std::char::EscapeDefault"]
+    assert errors == [
+        MalformedRecord(
+            line_number=1, line="warning: unused variable: `x`", type_name=None
+        ),
+        MalformedRecord(
+            line_number=6,
+            line="print-type-size     fie   Compiling foo v0.1.0",
+            type_name="std::char::EscapeUnicode",
+        ),
+        MalformedRecord(
+            line_number=9,
+            line="print-type-size ty",
+            type_name="std::marker::PhantomData<*mut ()>",
+        ),
+    ]
+
+
+test_tolerant_parse_truncated_type_line_data = """print-type-size type: `std::char::EscapeDefault`: 16 bytes, alignment: 8 bytes
+print-type-size     field `.state`: 16 bytes
+print-type-size type: `x`
+print-type-size     field `.c`: 4 bytes
+print-type-size type: `std::marker::PhantomData<*mut ()>`: 0 bytes, alignment: 1 bytes
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("workers", [1, 2])
+def test_tolerant_parse_truncated_type_line(engine, workers):
+    errors: List[MalformedRecord] = []
+    with io.StringIO(test_tolerant_parse_truncated_type_line_data) as type_sizes_file:
+        result = parse(
+            type_sizes_file, engine=engine, workers=workers, on_error=errors.append
+        )
+
+    # The type before the truncated type line is complete, so it is kept.
+    assert [rust_type.type_name for rust_type in result] == [
+        "std::char::EscapeDefault",
+        "std::marker::PhantomData<*mut ()>",
+    ]
+    assert errors == [
+        MalformedRecord(line_number=3, line="print-type-size type: `x`", type_name=None)
+    ]
+
+
+def test_tolerant_parse_path(tmp_path):
+    data_filepath = tmp_path / "tolerant.txt"
+    data_filepath.write_text(test_tolerant_parse_data)
+    errors: List[MalformedRecord] = []
+    result = parse_path(data_filepath, on_error=errors.append)
+
+    assert [rust_type.type_name for rust_type in result] == ["std::char::EscapeDefault"]
+    assert [error.line_number for error in errors] == [1, 6, 9]
+    assert errors[1].line == "print-type-size     fie   Compiling foo v0.1.0"
+
+
+def _print_command(text, exit_code=0):
+    """A command which prints `text`, then exits with `exit_code`."""
+    return [
+        sys.executable,
+        "-c",
+        f"import sys; sys.stdout.write({text!r}); sys.stdout.flush(); sys.exit({exit_code})",
+    ]
+
+
+def test_iter_parse_command():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    command = [
+        sys.executable,
+        "-c",
+        f"import sys; sys.stdout.write(open({str(data_filepath)!r}).read())",
+    ]
+    result = list(iter_parse_command(command))
+    assert result == parse_path(data_filepath)
+
+
+def test_iter_parse_command_failure():
+    test_command_output = """print-type-size type: `std::char::EscapeDefault`: 16 bytes, alignment: 8 bytes
+print-type-size     field `.state`: 16 bytes
+"""
+    result = iter_parse_command(_print_command(test_command_output, exit_code=101))
+    assert next(result).type_name == "std::char::EscapeDefault"
+    with pytest.raises(subprocess.CalledProcessError) as err:
+        next(result)
+    assert err.value.returncode == 101
+
+
+def test_iter_parse_command_yields_while_running():
+    # The command keeps running long after printing the types,
+    # so the first type must be parsed while it is still running.
+    command = [
+        sys.executable,
+        "-c",
+        "import time; "
+        "print('print-type-size type: `std::char::EscapeDefault`: 16 bytes, alignment: 8 bytes'); "
+        "print('print-type-size type: `std::char::EscapeUnicode`: 16 bytes, alignment: 8 bytes', flush=True); "
+        "time.sleep(60)",
+    ]
+    start = time.perf_counter()
+    result = iter_parse_command(command)
+    assert next(result).type_name == "std::char::EscapeDefault"
+    # Closing the iterator early stops the command.
+    result.close()
+    assert time.perf_counter() - start < 30
+
+
+def test_parse_unknown_engine():
+    with io.StringIO("") as type_sizes_file:
+        with pytest.raises(ValueError):
+            parse(type_sizes_file, engine="nonexistent")
+
+
+def test_layout_stats():
+    test_layout_stats_data = """print-type-size type: `core::num::fmt::Part<'_>`: 24 bytes, alignment: 8 bytes
+print-type-size     discriminant: 2 bytes
+print-type-size     variant `Copy`: 22 bytes
+print-type-size         padding: 6 bytes
+print-type-size         field `.0`: 16 bytes, alignment: 8 bytes
+print-type-size     variant `Num`: 2 bytes
+print-type-size         field `.0`: 2 bytes
+print-type-size type: `core::num::dec2flt::decimal::Decimal`: 784 bytes, alignment: 8 bytes
+print-type-size     field `.digits`: 768 bytes
+print-type-size     field `.num_digits`: 8 bytes
+print-type-size     field `.decimal_point`: 4 bytes
+print-type-size     field `.truncated`: 1 bytes
+print-type-size     end padding: 3 bytes
+print-type-size type: `std::sys::windows::c::OBJECT_ATTRIBUTES`: 48 bytes, alignment: 8 bytes
+print-type-size     field `.Length`: 4 bytes
+print-type-size     padding: 4 bytes
+print-type-size     field `.RootDirectory`: 8 bytes, alignment: 8 bytes
+print-type-size     field `.ObjectName`: 8 bytes
+print-type-size     field `.Attributes`: 4 bytes
+print-type-size     padding: 4 bytes
+print-type-size     field `.SecurityDescriptor`: 8 bytes, alignment: 8 bytes
+print-type-size     field `.SecurityQualityOfService`: 8 bytes
+print-type-size type: `{closure@src/main.rs:1:1}`: 0 bytes, alignment: 1 bytes
+"""
+    with io.StringIO(test_layout_stats_data) as type_sizes_file:
+        stats = LayoutStats(iter_parse(type_sizes_file, engine="fast"))
+
+    assert len(stats) == 4
+    assert list(stats.padding_bytes) == [6, 3, 8, 0]
+    assert list(stats.alignment_waste) == [0, 3, 0, 0]
+    assert list(stats.variant_imbalance) == [20, 0, 0, 0]
+
+    assert stats.largest(stats.type_sizes, 2) == [
+        ("core::num::dec2flt::decimal::Decimal", 784),
+        ("std::sys::windows::c::OBJECT_ATTRIBUTES", 48),
+    ]
+    # Types without any of the statistic are left out.
+    assert stats.largest(stats.alignment_waste, 10) == [
+        ("core::num::dec2flt::decimal::Decimal", 3)
+    ]
+    assert stats.largest_crates(10) == [("core", 9, 2), ("std", 8, 1)]
+
+    report = io.StringIO()
+    stats.write_report(report, count=1)
+    assert report.getvalue().startswith(
+        "4 types, 856 bytes, 17 bytes of padding (2.0%)\n"
+    )
+    assert "         784  core::num::dec2flt::decimal::Decimal\n" in report.getvalue()
+
+
+def test_diff_layouts():
+    old_data = """print-type-size type: `core::num::fmt::Part<'_>`: 24 bytes, alignment: 8 bytes
+print-type-size     discriminant: 2 bytes
+print-type-size     variant `Copy`: 22 bytes
+print-type-size         padding: 6 bytes
+print-type-size         field `.0`: 16 bytes, alignment: 8 bytes
+print-type-size     variant `Num`: 2 bytes
+print-type-size         field `.0`: 2 bytes
+print-type-size type: `core::num::dec2flt::decimal::Decimal`: 784 bytes, alignment: 8 bytes
+print-type-size     field `.digits`: 768 bytes
+print-type-size     field `.num_digits`: 8 bytes
+print-type-size     field `.decimal_point`: 4 bytes
+print-type-size     field `.truncated`: 1 bytes
+print-type-size     end padding: 3 bytes
+print-type-size type: `std::io::Removed`: 8 bytes, alignment: 8 bytes
+print-type-size     field `.0`: 8 bytes
+print-type-size type: `std::io::Unchanged`: 1 bytes, alignment: 1 bytes
+print-type-size     field `.0`: 1 bytes
+"""
+    new_data = """print-type-size type: `core::num::fmt::Part<'_>`: 24 bytes, alignment: 8 bytes
+print-type-size     discriminant: 1 bytes
+print-type-size     variant `Copy`: 23 bytes
+print-type-size         padding: 7 bytes
+print-type-size         field `.0`: 16 bytes, alignment: 8 bytes
+print-type-size     variant `Zero`: 2 bytes
+print-type-size         field `.0`: 2 bytes
+print-type-size type: `core::num::dec2flt::decimal::Decimal`: 792 bytes, alignment: 8 bytes
+print-type-size     field `.digits`: 768 bytes
+print-type-size     field `.decimal_point`: 4 bytes
+print-type-size     field `.truncated`: 1 bytes
+print-type-size     padding: 3 bytes
+print-type-size     field `.num_digits`: 16 bytes, alignment: 8 bytes
+print-type-size type: `std::io::Unchanged`: 1 bytes, alignment: 1 bytes
+print-type-size     field `.0`: 1 bytes
+print-type-size type: `std::io::Added`: 1 bytes, alignment: 1 bytes
+print-type-size     field `.0`: 1 bytes
+"""
+    with io.StringIO(old_data) as old_file, io.StringIO(new_data) as new_file:
+        layout_diff = diff_layouts(
+            iter_parse(old_file, engine="fast"), iter_parse(new_file, engine="fast")
+        )
+
+    assert layout_diff
+    assert layout_diff.added == ["std::io::Added"]
+    assert layout_diff.removed == ["std::io::Removed"]
+    assert layout_diff.changed == {
+        "core::num::fmt::Part<'_>": [
+            "discriminant 2 -> 1 bytes",
+            "variant `Copy` size 22 -> 23 bytes",
+            "variant `Num` removed",
+            "variant `Zero` added, 2 bytes",
+        ],
+        "core::num::dec2flt::decimal::Decimal": [
+            "size 784 -> 792 bytes",
+            "field `.num_digits` size 8 -> 16 bytes",
+            "field `.num_digits` offset 768 -> 776 bytes",
+            "field `.decimal_point` offset 776 -> 768 bytes",
+            "field `.truncated` offset 780 -> 772 bytes",
+        ],
+    }
+
+    with io.StringIO(old_data) as old_file, io.StringIO(old_data) as new_file:
+        assert not diff_layouts(
+            iter_parse(old_file, engine="fast"), iter_parse(new_file, engine="fast")
+        )
@@ -0,0 +1,114 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# The name under which the tests import this package, i.e. its directory name.
+PACKAGE_NAME = __package__.rpartition(".")[0]
+
+# A minimal stand-in for the parts of the Binary Ninja API which are used
+# while registering the plugin, so that its imports can be checked without
+# a Binary Ninja installation.
+_BINARYNINJA_STUB_MODULES = {
+    "__init__.py": "",
+    "binaryview.py": "class BinaryView:\n    pass\n",
+    "interaction.py": """
+class ChoiceField:
+    pass
+
+
+class DirectoryNameField:
+    pass
+
+
+class TextLineField:
+    pass
+
+
+def get_form_input(*args, **kwargs):
+    return False
+
+
+def get_open_filename_input(*args, **kwargs):
+    return None
+""",
+    "log.py": """
+class Logger:
+    def __init__(self, session_id, logger_name):
+        pass
+
+    def log_info(self, message):
+        pass
+
+    def log_warn(self, message):
+        pass
+
+    def log_error(self, message):
+        pass
+""",
+    "plugin.py": """
+class PluginCommand:
+    @staticmethod
+    def register(*args, **kwargs):
+        pass
+""",
+    "settings.py": """
+class Settings:
+    def register_group(self, group, title):
+        return True
+
+    def register_setting(self, key, properties):
+        return True
+""",
+    "typelibrary.py": "class TypeLibrary:\n    pass\n",
+}
+
+
+def _write_binaryninja_stub(directory):
+    stub_package_directory = directory / "binaryninja"
+    stub_package_directory.mkdir()
+    for module_file_name, module_source in _BINARYNINJA_STUB_MODULES.items():
+        (stub_package_directory / module_file_name).write_text(module_source)
+
+
+def _import_times(module_name, stub_directory):
+    """
+    Import `module_name` in a fresh interpreter with `-X importtime`,
+    with the modules in `stub_directory` taking precedence over any others,
+    returning the cumulative import time in microseconds of each module.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        path for path in (str(stub_directory), env.get("PYTHONPATH")) if path
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=Path(__file__).resolve().parents[2],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, imported_module_name = line[len("import time:") :].split("|")
+        import_times[imported_module_name.strip()] = int(cumulative_us)
+    return import_times
+
+
+def test_plugin_startup_imports(tmp_path):
+    _write_binaryninja_stub(tmp_path)
+    import_times = _import_times(f"{PACKAGE_NAME}.binja_plugin.plugin", tmp_path)
+    plugin_import_us = import_times[f"{PACKAGE_NAME}.binja_plugin.plugin"]
+    print(f"Imported the plugin in {plugin_import_us / 1000:.1f}ms")
+
+    for deferred_module_name in [
+        "pyparsing",
+        f"{PACKAGE_NAME}.parse",
+        f"{PACKAGE_NAME}.cache",
+        f"{PACKAGE_NAME}.binja_plugin.load_task",
+        f"{PACKAGE_NAME}.binja_plugin.type_import",
+    ]:
+        assert deferred_module_name not in import_times
@@ -0,0 +1,126 @@
+import io
+from pathlib import Path
+
+from ..parse import Field, Variant, parse, parse_path
+from ..type_graph import TypeGraph
+
+test_type_graph_data = """print-type-size type: `std::option::Option<std::result::Result<std::fs::Metadata, std::io::Error>>`: 24 bytes, alignment: 8 bytes
+print-type-size     variant `Some`: 24 bytes
+print-type-size         field `.0`: 24 bytes
+print-type-size     variant `None`: 0 bytes
+print-type-size type: `std::result::Result<std::fs::Metadata, std::io::Error>`: 24 bytes, alignment: 8 bytes
+print-type-size     discriminant: 8 bytes
+print-type-size     variant `Ok`: 16 bytes
+print-type-size         field `.0`: 16 bytes
+print-type-size     variant `Err`: 8 bytes
+print-type-size         field `.0`: 8 bytes
+print-type-size type: `std::fs::Metadata`: 16 bytes, alignment: 8 bytes
+print-type-size     field `.0`: 16 bytes
+print-type-size type: `std::io::Error`: 8 bytes, alignment: 8 bytes
+print-type-size     field `.repr`: 8 bytes
+print-type-size type: `(std::io::Error, std::io::Error)`: 16 bytes, alignment: 8 bytes
+print-type-size     field `.0`: 8 bytes
+print-type-size     field `.1`: 8 bytes
+print-type-size type: `std::vec::Vec<std::io::Error>`: 24 bytes, alignment: 8 bytes
+print-type-size     field `.buf`: 16 bytes
+print-type-size     field `.len`: 8 bytes
+print-type-size type: `std::collections::HashMap<std::io::Error, (std::io::Error, std::io::Error), std::fs::Metadata>`: 32 bytes, alignment: 8 bytes
+print-type-size     field `.0`: 16 bytes
+print-type-size     field `.1`: 8 bytes
+print-type-size     field `.2`: 8 bytes
+"""
+
+
+def _parse_test_graph():
+    with io.StringIO(test_type_graph_data) as type_sizes_file:
+        return TypeGraph(parse(type_sizes_file, engine="fast"))
+
+
+def test_type_graph_dependencies():
+    type_graph = _parse_test_graph()
+    assert type_graph.dependencies(
+        "std::option::Option<std::result::Result<std::fs::Metadata, std::io::Error>>"
+    ) == ["std::result::Result<std::fs::Metadata, std::io::Error>"]
+    assert type_graph.dependencies(
+        "std::result::Result<std::fs::Metadata, std::io::Error>"
+    ) == ["std::fs::Metadata", "std::io::Error"]
+    assert type_graph.dependencies("(std::io::Error, std::io::Error)") == [
+        "std::io::Error"
+    ]
+    # Named fields are never matched.
+    assert type_graph.dependencies("std::vec::Vec<std::io::Error>") == []
+    # Two generic arguments have a size of 16 bytes, so `.0` is ambiguous.
+    assert type_graph.dependencies(
+        "std::collections::HashMap<std::io::Error, (std::io::Error, std::io::Error), std::fs::Metadata>"
+    ) == ["std::io::Error"]
+    assert type_graph.dependencies("std::io::Error") == []
+
+
+def test_type_graph_field_type():
+    type_graph = _parse_test_graph()
+    result_type = type_graph.types[
+        "std::result::Result<std::fs::Metadata, std::io::Error>"
+    ]
+    err_variant = result_type.fields[2]
+    assert isinstance(err_variant, Variant)
+    assert err_variant.fields is not None
+    err_field = err_variant.fields[0]
+    assert isinstance(err_field, Field)
+
+    err_field_type = type_graph.field_type(result_type, err_field, err_variant)
+    assert err_field_type is type_graph.types["std::io::Error"]
+    # The field of the same name outside of the variant is not matched.
+    assert type_graph.field_type(result_type, err_field) is None
+
+
+def test_type_graph_topological_order():
+    type_graph = _parse_test_graph()
+    type_names = [rust_type.type_name for rust_type in type_graph.topological_order()]
+    assert type_names == [
+        "std::fs::Metadata",
+        "std::io::Error",
+        "std::result::Result<std::fs::Metadata, std::io::Error>",
+        "std::option::Option<std::result::Result<std::fs::Metadata, std::io::Error>>",
+        "(std::io::Error, std::io::Error)",
+        "std::vec::Vec<std::io::Error>",
+        "std::collections::HashMap<std::io::Error, (std::io::Error, std::io::Error), std::fs::Metadata>",
+    ]
+
+
+def test_type_graph_topological_order_complete():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    type_graph = TypeGraph(parse_path(data_filepath))
+    ordered_types = type_graph.topological_order()
+    assert len(ordered_types) == len(type_graph.types)
+
+    defined_names = set()
+    for rust_type in ordered_types:
+        for dependency_name in type_graph.dependencies(rust_type.type_name):
+            assert dependency_name in defined_names
+        defined_names.add(rust_type.type_name)
+
+
+def test_type_graph_unparsed_generic_arguments():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    type_graph = TypeGraph(parse_path(data_filepath))
+
+    # `&str` has the same size as `Utf8Error`, but is not a parsed type,
+    # so neither variant's field can be matched by size.
+    assert "std::str::Utf8Error" in type_graph.types
+    assert (
+        type_graph.dependencies("std::result::Result<&str, std::str::Utf8Error>") == []
+    )
+    assert (
+        type_graph.dependencies(
+            "std::result::Result<&std::net::SocketAddr, std::io::Error>"
+        )
+        == []
+    )
+    # Both `SimpleMessage` and `Custom` hold a field of the size of the
+    # `Box<Custom>` generic argument, so neither is matched.
+    assert (
+        type_graph.dependencies(
+            "std::io::error::ErrorData<std::boxed::Box<std::io::error::Custom>>"
+        )
+        == []
+    )
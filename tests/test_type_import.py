@@ -0,0 +1,207 @@
+import io
+import time
+from pathlib import Path
+
+import pytest
+
+from ..parse import Field, parse
+
+# These tests need a headless-capable Binary Ninja installation.
+binaryninja = pytest.importorskip("binaryninja")
+
+from ..binja_plugin.type_import import (  # noqa: E402
+    _create_bn_types_for_rust_type,
+    create_binary_view_types,
+)
+
+
+def _parse_test_data():
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    with open(data_filepath, "r") as type_sizes_file:
+        return parse(type_sizes_file, engine="fast")
+
+
+def test_bulk_type_definition_timing():
+    rust_types = _parse_test_data()
+
+    bn_type_definitions = [
+        bn_type_definition
+        for rust_type in rust_types
+        for bn_type_definition in _create_bn_types_for_rust_type(rust_type)
+    ]
+
+    individual_bv = binaryninja.BinaryView.new(b"\x00")
+    individual_start = time.perf_counter()
+    for bn_type_name, bn_type in bn_type_definitions:
+        individual_bv.define_user_type(name=bn_type_name, type_obj=bn_type)
+    individual_seconds = time.perf_counter() - individual_start
+
+    bulk_bv = binaryninja.BinaryView.new(b"\x00")
+    bulk_start = time.perf_counter()
+    create_binary_view_types(bv=bulk_bv, rust_types=rust_types)
+    bulk_seconds = time.perf_counter() - bulk_start
+
+    print(
+        f"Defined {len(bn_type_definitions)} types: "
+        f"{individual_seconds:.3f}s individually, {bulk_seconds:.3f}s in bulk"
+    )
+
+    for bn_type_name, _ in bn_type_definitions:
+        assert bulk_bv.get_type_by_name(bn_type_name) is not None
+
+
+def test_incremental_reimport():
+    rust_types = _parse_test_data()
+    bv = binaryninja.BinaryView.new(b"\x00")
+    create_binary_view_types(bv=bv, rust_types=rust_types)
+
+    # `miniz_oxide::deflate::buffer::HashBuffers`, which is a struct.
+    changed_type = rust_types[0]
+    changed_field = changed_type.fields[0]
+    assert isinstance(changed_field, Field)
+    changed_field.field_size += 8
+    changed_type.type_size += 8
+    vanished_type = rust_types.pop()
+    unchanged_type_names = [rust_type.type_name for rust_type in rust_types[1:]]
+
+    create_binary_view_types(bv=bv, rust_types=rust_types, remove_vanished_types=True)
+
+    assert bv.get_type_by_name(changed_type.type_name).width == changed_type.type_size
+    assert bv.get_type_by_name(vanished_type.type_name) is None
+    for type_name in unchanged_type_names:
+        assert bv.get_type_by_name(type_name) is not None
+
+
+def test_cancelled_import():
+    rust_types = _parse_test_data()
+    bv = binaryninja.BinaryView.new(b"\x00")
+    build_count = 0
+
+    def is_cancelled():
+        nonlocal build_count
+        build_count += 1
+        return build_count > 10
+
+    create_binary_view_types(bv=bv, rust_types=rust_types, is_cancelled=is_cancelled)
+
+    # The types built before the import was cancelled are not defined either.
+    assert build_count == 11
+    for rust_type in rust_types:
+        assert bv.get_type_by_name(rust_type.type_name) is None
+
+
+def test_named_field_types():
+    rust_types = _parse_test_data()
+    bv = binaryninja.BinaryView.new(b"\x00")
+    create_binary_view_types(bv=bv, rust_types=rust_types)
+
+    ok_variant_struct = bv.get_type_by_name(
+        "std::result::Result<std::fs::DirEntry, std::io::Error>::Ok"
+    )
+    ok_field_type = ok_variant_struct.members[0].type
+    assert isinstance(ok_field_type, binaryninja.types.NamedTypeReferenceType)
+    assert str(ok_field_type.name) == "std::fs::DirEntry"
+    assert ok_field_type.width == bv.get_type_by_name("std::fs::DirEntry").width
+
+
+def _member_offsets(bn_type):
+    return {member.name: member.offset for member in bn_type.members}
+
+
+def test_field_offsets():
+    data_filepath = Path("tests") / Path("data") / "variants.txt"
+    with open(data_filepath, "r") as type_sizes_file:
+        rust_types = parse(type_sizes_file, engine="fast")
+    bn_types = dict(
+        bn_type_definition
+        for rust_type in rust_types
+        for bn_type_definition in _create_bn_types_for_rust_type(rust_type)
+    )
+
+    # The fields of a union overlap.
+    union_variant = bn_types["std::sys_common::net::SocketAddrCRepr::SocketAddrCRepr"]
+    assert union_variant.width == 28
+    assert _member_offsets(union_variant) == {".v4": 0, ".v6": 0}
+    assert bn_types["std::sys_common::net::SocketAddrCRepr"].width == 28
+
+    # Padding is left as a gap, rather than created as a member.
+    complex_variant = bn_types["Number::Complex"]
+    assert _member_offsets(complex_variant) == {".real": 0, ".imaginary": 8}
+    number_struct = bn_types["Number"]
+    assert number_struct.width == 24
+    assert _member_offsets(number_struct) == {
+        "discriminant": 0,
+        "Number::variants": 8,
+    }
+
+
+def test_field_offsets_padding():
+    test_field_offsets_data = """print-type-size type: `core::num::fmt::Part<'_>`: 24 bytes, alignment: 8 bytes
+print-type-size     discriminant: 2 bytes
+print-type-size     variant `Copy`: 22 bytes
+print-type-size         padding: 6 bytes
+print-type-size         field `.0`: 16 bytes, alignment: 8 bytes
+print-type-size     variant `Num`: 2 bytes
+print-type-size         field `.0`: 2 bytes
+print-type-size type: `core::num::dec2flt::decimal::Decimal`: 784 bytes, alignment: 8 bytes
+print-type-size     field `.digits`: 768 bytes
+print-type-size     field `.num_digits`: 8 bytes
+print-type-size     field `.decimal_point`: 4 bytes
+print-type-size     field `.truncated`: 1 bytes
+print-type-size     end padding: 3 bytes
+"""
+    with io.StringIO(test_field_offsets_data) as type_sizes_file:
+        rust_types = parse(type_sizes_file, engine="fast")
+    bn_types = dict(
+        bn_type_definition
+        for rust_type in rust_types
+        for bn_type_definition in _create_bn_types_for_rust_type(rust_type)
+    )
+
+    # Variant structs start after the discriminant.
+    copy_variant = bn_types["core::num::fmt::Part<'_>::Copy"]
+    assert copy_variant.width == 22
+    assert _member_offsets(copy_variant) == {".0": 6}
+    assert _member_offsets(bn_types["core::num::fmt::Part<'_>"]) == {
+        "discriminant": 0,
+        "core::num::fmt::Part<'_>::variants": 2,
+    }
+
+    # Overlaid variant structs span the whole enum, including the discriminant.
+    overlaid_bn_types = dict(
+        _create_bn_types_for_rust_type(rust_types[0], overlay_enum_variants=True)
+    )
+    overlaid_copy_variant = overlaid_bn_types["core::num::fmt::Part<'_>::Copy"]
+    assert overlaid_copy_variant.width == 24
+    assert _member_offsets(overlaid_copy_variant) == {".0": 8}
+    assert _member_offsets(overlaid_bn_types["core::num::fmt::Part<'_>::Num"]) == {
+        ".0": 2
+    }
+    assert _member_offsets(overlaid_bn_types["core::num::fmt::Part<'_>"]) == {
+        "discriminant": 0,
+        "core::num::fmt::Part<'_>::variants": 0,
+    }
+
+    decimal_struct = bn_types["core::num::dec2flt::decimal::Decimal"]
+    assert decimal_struct.width == 784
+    assert _member_offsets(decimal_struct) == {
+        ".digits": 0,
+        ".num_digits": 768,
+        ".decimal_point": 776,
+        ".truncated": 780,
+    }
+
+
+def test_field_offsets_out_of_bounds():
+    test_field_offsets_data = """print-type-size type: `Truncated`: 8 bytes, alignment: 8 bytes
+print-type-size     field `.0`: 4 bytes
+print-type-size     field `.1`: 8 bytes
+"""
+    with io.StringIO(test_field_offsets_data) as type_sizes_file:
+        (rust_type,) = parse(type_sizes_file, engine="fast")
+    bn_types = dict(_create_bn_types_for_rust_type(rust_type))
+
+    # A field which does not fit is skipped, rather than growing the struct.
+    truncated_struct = bn_types["Truncated"]
+    assert truncated_struct.width == 8
+    assert _member_offsets(truncated_struct) == {".0": 0}
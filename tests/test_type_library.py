@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+from ..parse import parse_path
+
+# These tests need a headless-capable Binary Ninja installation.
+binaryninja = pytest.importorskip("binaryninja")
+
+from ..binja_plugin.type_import import create_type_library  # noqa: E402
+
+
+def test_type_library_round_trip(tmp_path):
+    data_filepath = Path("tests") / Path("data") / "print-type-sizes.txt"
+    rust_types = parse_path(data_filepath)
+    platform = binaryninja.Platform["windows-x86_64"]
+
+    type_library_path = tmp_path / "print-type-sizes.bntl"
+    create_type_library(
+        rust_types, name="print-type-sizes", platform=platform
+    ).write_to_file(str(type_library_path))
+
+    type_library = binaryninja.TypeLibrary.load_from_file(str(type_library_path))
+    assert type_library.name == "print-type-sizes"
+    type_names = {str(type_name) for type_name in type_library.named_types}
+    for rust_type in rust_types:
+        assert rust_type.type_name in type_names
+
+    # Types are only imported into a BinaryView when they are referenced.
+    bv = binaryninja.BinaryView.new(b"\x00")
+    bv.platform = platform
+    bv.add_type_library(type_library)
+    assert bv.get_type_by_name("std::fs::DirEntry") is None
+    assert bv.import_library_type("std::fs::DirEntry", type_library) is not None
+    assert bv.get_type_by_name("std::fs::DirEntry").width == next(
+        rust_type.type_size
+        for rust_type in rust_types
+        if rust_type.type_name == "std::fs::DirEntry"
+    )
@@ -0,0 +1,178 @@
+"""
+The dependencies between parsed Rust types, through their fields.
+
+The output of `-Zprint-type-sizes` does not include the type of each field,
+but the types which a generic type or tuple holds are usually named in its
+generic arguments or elements. For example, the `.0` field of the `Ok`
+variant of `std::result::Result<std::fs::ReadDir, std::io::Error>` is a
+`std::fs::ReadDir`, which can be found by matching the field's size against
+the sizes of the parsed types named in the generic arguments.
+
+Only positional fields, e.g. `.0`, are matched. Named fields, e.g. the
+`.len` of a `Vec<T>`, rarely hold a generic argument directly, and are
+easily mistaken for one which happens to have the same size.
+Generic arguments are only matched by size when all of them are parsed
+types, since the size of a reference, primitive or slice is not known.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .parse import Field, Type, Variant, component_type_names
+
+_POSITIONAL_FIELD_NAME_RE = re.compile(r"^\.\d+$")
+
+_POINTER_PREFIXES = ("&", "*const", "*mut")
+
+# Identifies a field within a type, by the name of the variant containing it
+# (or `None` for a field of a struct), and the field's name.
+_FieldKey = Tuple[Optional[str], str]
+
+
+class TypeGraph:
+    """
+    An index over parsed Rust types by name, along with the named type of
+    each of their fields, where it can be determined.
+    Only the first type with each name is kept.
+    """
+
+    def __init__(self, rust_types: Iterable[Type]):
+        self.types: Dict[str, Type] = {}
+        for rust_type in rust_types:
+            self.types.setdefault(rust_type.type_name, rust_type)
+
+        self._field_types: Dict[str, Dict[_FieldKey, Type]] = {}
+        for rust_type in self.types.values():
+            field_types = self._resolve_field_types(rust_type)
+            if field_types:
+                self._field_types[rust_type.type_name] = field_types
+
+    def _resolve_field_types(self, rust_type: Type) -> Dict[_FieldKey, Type]:
+        # References and pointers are never parsed types themselves, and
+        # neither are primitives or slices, so they are `None` here.
+        component_types = [
+            None
+            if component_name.startswith(_POINTER_PREFIXES)
+            else self.types.get(component_name)
+            for component_name in component_type_names(rust_type.type_name)
+        ]
+        if not any(component_types):
+            return {}
+
+        # For a tuple, the type of each field is given by its position.
+        is_tuple = rust_type.type_name.startswith("(")
+        # Otherwise, the generic arguments are matched by size, as long as
+        # only one of them has each size. The size of a generic argument
+        # which is not a parsed type is unknown, so it may match any field,
+        # and no field is matched at all.
+        if not is_tuple and not all(component_types):
+            return {}
+        component_types_by_size: Dict[int, Optional[Type]] = {}
+        for component_type in component_types:
+            if component_type is None or component_type.type_size == 0:
+                continue
+            size = component_type.type_size
+            if component_types_by_size.get(size, component_type) is component_type:
+                component_types_by_size[size] = component_type
+            else:
+                component_types_by_size[size] = None
+
+        field_types: Dict[_FieldKey, Type] = {}
+        for variant_name, rust_field in _iter_fields(rust_type):
+            if rust_field.field_size == 0 or not _POSITIONAL_FIELD_NAME_RE.match(
+                rust_field.field_name
+            ):
+                continue
+            field_type: Optional[Type]
+            if is_tuple:
+                position = int(rust_field.field_name[1:])
+                field_type = (
+                    component_types[position]
+                    if position < len(component_types)
+                    else None
+                )
+                if field_type is not None and (
+                    field_type.type_size != rust_field.field_size
+                ):
+                    field_type = None
+            else:
+                field_type = component_types_by_size.get(rust_field.field_size)
+            if field_type is not None:
+                field_types[(variant_name, rust_field.field_name)] = field_type
+
+        if not is_tuple:
+            # A generic argument matched in more than one variant of an
+            # enum is usually held by only one of them, e.g. the `Custom`
+            # variant of `ErrorData<Box<Custom>>`, while the others hold
+            # something else of the same size, so none of them are matched.
+            variant_names_by_type: Dict[str, Set[Optional[str]]] = {}
+            for (variant_name, _), field_type in field_types.items():
+                variant_names_by_type.setdefault(field_type.type_name, set()).add(
+                    variant_name
+                )
+            field_types = {
+                field_key: field_type
+                for field_key, field_type in field_types.items()
+                if len(variant_names_by_type[field_type.type_name]) == 1
+            }
+        return field_types
+
+    def field_type(
+        self, rust_type: Type, rust_field: Field, rust_variant: Optional[Variant] = None
+    ) -> Optional[Type]:
+        """
+        Return the parsed type held by a field of `rust_type`, or of its
+        variant `rust_variant`, or `None` if it cannot be determined.
+        """
+        field_types = self._field_types.get(rust_type.type_name)
+        if field_types is None:
+            return None
+        variant_name = None if rust_variant is None else rust_variant.variant_name
+        return field_types.get((variant_name, rust_field.field_name))
+
+    def dependencies(self, type_name: str) -> List[str]:
+        """
+        Return the names of the types held by the fields of a type,
+        without duplicates.
+        """
+        field_types = self._field_types.get(type_name, {})
+        return list(
+            dict.fromkeys(field_type.type_name for field_type in field_types.values())
+        )
+
+    def topological_order(self) -> List[Type]:
+        """
+        Return the types in an order in which every type comes after the
+        types held by its fields, but otherwise in their original order.
+        """
+        ordered_types: List[Type] = []
+        visited_names: Set[str] = set()
+        for root_name in self.types:
+            if root_name in visited_names:
+                continue
+            visited_names.add(root_name)
+            # An explicit stack, as chains of nested generic types can be deep.
+            stack = [(root_name, iter(self.dependencies(root_name)))]
+            while stack:
+                type_name, pending_dependencies = stack[-1]
+                for dependency_name in pending_dependencies:
+                    if dependency_name not in visited_names:
+                        visited_names.add(dependency_name)
+                        stack.append(
+                            (dependency_name, iter(self.dependencies(dependency_name)))
+                        )
+                        break
+                else:
+                    stack.pop()
+                    ordered_types.append(self.types[type_name])
+        return ordered_types
+
+
+def _iter_fields(rust_type: Type) -> Iterable[Tuple[Optional[str], Field]]:
+    for rust_type_field in rust_type.fields:
+        if isinstance(rust_type_field, Field):
+            yield None, rust_type_field
+        elif isinstance(rust_type_field, Variant) and rust_type_field.fields:
+            for rust_variant_field in rust_type_field.fields:
+                if isinstance(rust_variant_field, Field):
+                    yield rust_type_field.variant_name, rust_variant_field